@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from html_scan import charset_from_content_type, scan_html, seo_from_scan, technical_from_scan
+from http_fetch import fetch
+from site_audit import OUTPUT_DIR, find_issues, images_report, links_report
+
+FETCH_CONCURRENCY = 16      # Одновременно скачиваемых сайтов
+WORKERS = os.cpu_count() or 1
+
+
+def read_sites(path):
+    """Список URL из файла: по одному на строку, # - комментарий"""
+    sites = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if '://' not in line:
+                line = f"https://{line}"
+            sites.append(line)
+    return list(dict.fromkeys(sites))
+
+
+def analyze_html(content, encoding):
+    """CPU-часть аудита: разбор HTML и SEO/технический анализ (выполняется в пуле процессов)"""
+    scan = scan_html(content, encoding)
+    return {
+        'seo': seo_from_scan(scan),
+        'technical': technical_from_scan(scan),
+        'images': scan.images,
+        'anchors': scan.anchors,
+    }
+
+
+def _fetch_site(url):
+    start = time.perf_counter()
+    response = fetch(url)
+    return response, time.perf_counter() - start
+
+
+async def audit_site(url, pool, semaphore, check_resources):
+    """Аудит одного сайта: сеть - в asyncio, разбор - в пуле процессов"""
+    loop = asyncio.get_running_loop()
+    result = {'url': url}
+    try:
+        async with semaphore:
+            response, load_time = await asyncio.to_thread(_fetch_site, url)
+        result['status'] = response.status_code
+        result['load_time'] = round(load_time, 3)
+        if response.status_code != 200:
+            result['error'] = f"HTTP {response.status_code}"
+            return result
+
+        encoding = charset_from_content_type(response.headers.get('content-type'))
+        parsed = await loop.run_in_executor(pool, analyze_html, response.content, encoding)
+        result['seo'] = parsed['seo']
+        result['technical'] = parsed['technical']
+
+        if check_resources:
+            result['images'] = await asyncio.to_thread(images_report, parsed['images'], response.url)
+            result['links'] = await asyncio.to_thread(links_report, parsed['anchors'], response.url)
+        else:
+            missing_alt = sum(1 for _, alt in parsed['images'] if not alt)
+            result['images'] = {'total': len(parsed['images']), 'missing_alt': missing_alt}
+            result['links'] = {'total': len(parsed['anchors'])}
+
+        result['issues'] = find_issues(result['seo'], result['technical'], result['images'], load_time)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def site_filename(url):
+    """Имя файла отчета: хост и путь без спецсимволов"""
+    parsed = urlparse(url)
+    return re.sub(r'[^\w.-]+', '_', parsed.netloc + parsed.path).strip('_') or 'site'
+
+
+def render_site_markdown(result):
+    """Короткий отчет по одному сайту"""
+    lines = [f"# Аудит {result['url']}", ""]
+    if 'error' in result:
+        lines.append(f"Ошибка: {result['error']}")
+        return "\n".join(lines) + "\n"
+    seo = result['seo']
+    tech = result['technical']
+    lines += [
+        f"- Статус: {result['status']}",
+        f"- Время загрузки: {result['load_time']:.2f} секунд",
+        f"- Заголовок: '{seo['title']['text']}' ({seo['title']['length']} символов)",
+        f"- Описание: {seo['description']['length']} символов",
+        f"- Заголовки H1: {seo['headings']['h1_count']} шт.",
+        f"- Изображений: {result['images']['total']}, без alt: {result['images']['missing_alt']}",
+        f"- Ссылок: {result['links']['total']}",
+        f"- Viewport: {tech['viewport']}, язык: {tech['html_lang']}, favicon: {tech['favicon']}",
+        "",
+        "## Найденные проблемы",
+    ]
+    lines += [f"{i}. {issue}" for i, issue in enumerate(result['issues'], 1)] or ["Проблем не найдено!"]
+    return "\n".join(lines) + "\n"
+
+
+def render_summary_markdown(results, stats):
+    """Сводная таблица по всем сайтам"""
+    lines = [
+        "# Сводный аудит сайтов",
+        "",
+        f"- Сайтов: {stats['sites']} (ошибок: {stats['errors']})",
+        f"- Время: {stats['elapsed']} секунд, {stats['sites_per_sec']} сайтов/с, процессов: {stats['workers']}",
+        "",
+        "| Сайт | Статус | Загрузка, с | H1 | Без alt | Проблем |",
+        "|------|--------|-------------|----|---------|---------|",
+    ]
+    for r in results:
+        if 'error' in r:
+            lines.append(f"| {r['url']} | {r.get('status', 'ERR')} | - | - | - | {r['error']} |")
+        else:
+            lines.append(
+                f"| {r['url']} | {r['status']} | {r['load_time']:.2f} | {r['seo']['headings']['h1_count']} "
+                f"| {r['images']['missing_alt']} | {len(r['issues'])} |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+async def run_batch(sites, output_dir, workers=WORKERS, concurrency=FETCH_CONCURRENCY, check_resources=True):
+    """Аудит списка сайтов. Отчеты по сайтам пишутся по мере готовности"""
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    # asyncio.to_thread по умолчанию - min(32, CPU + 4) потоков: на concurrency скачиваний и столько же
+    # проверок ссылок и изображений их бы не хватило
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency * 2))
+    results = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = [asyncio.create_task(audit_site(url, pool, semaphore, check_resources)) for url in sites]
+        for done in asyncio.as_completed(tasks):
+            result = await done
+            results.append(result)
+            name = site_filename(result['url'])
+            with open(os.path.join(output_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            with open(os.path.join(output_dir, f"{name}.md"), 'w', encoding='utf-8') as f:
+                f.write(render_site_markdown(result))
+            print(f"   [{len(results)}/{len(sites)}] {result.get('status', 'ERR')} {result['url']}")
+
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda r: sites.index(r['url']))
+    stats = {
+        'sites': len(sites),
+        'errors': sum(1 for r in results if 'error' in r),
+        'elapsed': round(elapsed, 2),
+        'sites_per_sec': round(len(sites) / elapsed, 2) if elapsed else None,
+        'workers': workers,
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({'stats': stats, 'results': results}, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, 'SUMMARY.md'), 'w', encoding='utf-8') as f:
+        f.write(render_summary_markdown(results, stats))
+    return stats
+
+
+def measure_scaling(sites, max_workers=WORKERS):
+    """Скорость CPU-части (разбор + анализ) на 1, 2, 4 ... max_workers процессах"""
+    pages = []
+    for url in sites:
+        try:
+            response = fetch(url)
+        except Exception as e:
+            print(f"   Пропущен {url}: {e}")
+            continue
+        if response.status_code == 200:
+            pages.append((response.content, charset_from_content_type(response.headers.get('content-type'))))
+    if not pages:
+        print("   Нет страниц для замера")
+        return []
+
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+
+    rows = []
+    for n in counts:
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            # Прогрев: запуск процессов не входит в замер
+            list(pool.map(analyze_html, *zip(*pages[:n])))
+            start = time.perf_counter()
+            list(pool.map(analyze_html, *zip(*pages), chunksize=max(1, len(pages) // (n * 4))))
+            elapsed = time.perf_counter() - start
+        rows.append({'workers': n, 'elapsed': round(elapsed, 3), 'sites_per_sec': round(len(pages) / elapsed, 1)})
+        print(f"   Процессов: {n:>3}  {rows[-1]['sites_per_sec']:>8} сайтов/с  (x{rows[-1]['sites_per_sec'] / rows[0]['sites_per_sec']:.1f})")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный аудит списка сайтов")
+    parser.add_argument("sites_file", help="Файл со списком URL (по одному на строку)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Процессов для разбора HTML")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY, help="Одновременно скачиваемых сайтов")
+    parser.add_argument("--no-resources", action="store_true", help="Не проверять изображения и ссылки")
+    parser.add_argument("--scaling", action="store_true", help="Замерить масштабирование разбора по числу ядер")
+    args = parser.parse_args()
+
+    sites = read_sites(args.sites_file)
+    if args.scaling:
+        print(f"Замер масштабирования на {len(sites)} сайтах (ядер: {WORKERS})...")
+        measure_scaling(sites, args.workers)
+        return
+
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = os.path.join(OUTPUT_DIR, f"batch_{timestamp}")
+    print(f"Пакетный аудит {len(sites)} сайтов (процессов: {args.workers}, загрузок: {args.concurrency})...")
+    stats = asyncio.run(run_batch(sites, output_dir, args.workers, args.concurrency, not args.no_resources))
+    print(f"\n   Сайтов: {stats['sites']}, ошибок: {stats['errors']}")
+    print(f"   Время: {stats['elapsed']} секунд, скорость: {stats['sites_per_sec']} сайтов/с")
+    print(f"   Отчеты сохранены в папку: {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
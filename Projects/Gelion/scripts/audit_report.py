@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import time
+
+from page_timing import PHASE_NAMES, PHASES
+
+# Все отчеты пишутся в output/ проекта, независимо от текущей папки запуска
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = os.path.join(PROJECT_DIR, 'output')
+
+
+def output_path(filename):
+    """Путь к файлу отчета внутри output/ проекта"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, filename)
+
+
+class RecordWriter:
+    """Потоковая запись результатов аудита в JSONL: одна строка на завершенный этап.
+    Каждая запись сразу сбрасывается в файл, поэтому при сбое сохраняются готовые этапы"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def emit(self, record_type, data):
+        record = {'type': record_type, 'ts': round(time.time(), 3), 'data': data}
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path):
+    """Чтение записей по одной, без загрузки всего файла. Оборванная последняя строка пропускается"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _numbered(items, empty_text):
+    if not items:
+        return [empty_text]
+    return [f"{i}. {item}" for i, item in enumerate(items, 1)]
+
+
+def render_meta(data):
+    return [f"# Отчет по анализу сайта {data['host']}", ""]
+
+
+def render_timing(data):
+    timings = data['timings']
+    lines = [
+        "## Общая информация",
+        f"- URL: {data['url']}",
+        f"- Статус: {data['status']}",
+        f"- Время загрузки: {timings['total']:.2f} секунд",
+        "",
+        "## Время загрузки",
+    ]
+    lines += [f"- {PHASE_NAMES[p]}: {timings[p] * 1000:.0f} мс" for p in PHASES if p == 'total' or timings.get(p)]
+    lines.append(f"- Размер ответа: {data['wire_bytes'] / 1024:.1f} КБ")
+    summary = data.get('summary')
+    if summary:
+        lines += ["", f"Замеров: {summary['samples']}", "", "| Фаза | p50, мс | p90, мс | p99, мс |", "|------|---------|---------|---------|"]
+        for phase in PHASES:
+            values = summary[phase]
+            lines.append(f"| {PHASE_NAMES[phase]} | {values['p50'] * 1000:.0f} | {values['p90'] * 1000:.0f} | {values['p99'] * 1000:.0f} |")
+        speed = summary['bytes_per_sec']
+        lines += ["", f"- Скорость загрузки: p50 {speed['p50'] / 1024:.0f} КБ/с, p90 {speed['p90'] / 1024:.0f} КБ/с, p99 {speed['p99'] / 1024:.0f} КБ/с"]
+    if data.get('not_modified'):
+        lines.append("- Страница не изменилась с прошлого аудита, использован сохраненный анализ")
+    lines.append("")
+    return lines
+
+
+def render_seo(seo_report):
+    return [
+        "## SEO Анализ",
+        f"- Заголовок: '{seo_report['title']['text']}' ({seo_report['title']['length']} символов)",
+        f"- Описание: '{seo_report['description']['content']}' ({seo_report['description']['length']} символов)",
+        f"- Ключевые слова: {seo_report['keywords']['content']}",
+        f"- Заголовки H1: {seo_report['headings']['h1_count']} шт. - {seo_report['headings']['h1_text']}",
+        f"- Заголовки H2: {seo_report['headings']['h2_count']} шт.",
+        f"- Заголовки H3: {seo_report['headings']['h3_count']} шт.",
+        "",
+    ]
+
+
+def render_images(img_report):
+    return [
+        "## Анализ изображений",
+        f"- Всего изображений: {img_report['total']}",
+        f"- Изображений без alt-атрибута: {img_report['missing_alt']}",
+        f"- Оптимизированных изображений: {img_report['optimized']}",
+        f"- Неоптимизированных изображений: {img_report['unoptimized']}",
+        "",
+    ]
+
+
+def render_links(link_report):
+    lines = [
+        "## Анализ ссылок",
+        f"- Всего ссылок: {link_report['total']}",
+        f"- Рабочих ссылок: {link_report['working']}",
+        f"- Сломанных ссылок: {link_report['broken']}",
+        f"- Внешних ссылок: {link_report['external']}",
+    ]
+    for link_url, result in link_report.get('details', {}).items():
+        if result['status'] is None or result['status'] >= 400:
+            lines.append(f"  - {link_url}: {result['status'] or result['error']}")
+    lines.append("")
+    return lines
+
+
+def render_technical(tech_report):
+    return [
+        "## Технический анализ",
+        f"- Наличие viewport: {tech_report['viewport']}",
+        f"- Язык HTML: {tech_report['html_lang']}",
+        f"- Наличие favicon: {tech_report['favicon']}",
+        f"- Наличие структурированных данных: {tech_report['structured_data']}",
+        "",
+    ]
+
+
+def render_issues(issues):
+    return ["## Найденные проблемы"] + _numbered(issues, "Проблем не найдено!") + [""]
+
+
+def render_recommendations(recommendations):
+    return ["## Рекомендации по улучшению"] + _numbered(recommendations, "Рекомендаций по улучшению нет!") + [""]
+
+
+def render_changes(data):
+    lines = ["## Изменения с прошлого аудита"]
+    if not data['previous_audit']:
+        lines.append("Первый аудит страницы, сравнивать не с чем.")
+    elif not data['changes']:
+        lines.append("Изменений нет.")
+    else:
+        lines += ["| Параметр | Было | Стало |", "|----------|------|-------|"]
+        lines += [f"| {key} | {old} | {new} |" for key, old, new in data['changes']]
+    lines.append("")
+    return lines
+
+
+def render_page(data):
+    """Страница из обхода сайта - короткий блок"""
+    lines = [f"## {data['url']}", f"- Статус: {data.get('status', 'ERR')}, глубина: {data['depth']}"]
+    if 'error' in data:
+        lines.append(f"- Ошибка: {data['error']}")
+    if 'seo' in data:
+        seo = data['seo']
+        lines.append(f"- Заголовок: '{seo['title']['text']}' ({seo['title']['length']} символов), H1: {seo['headings']['h1_count']} шт.")
+        lines.append(f"- Изображений без alt: {data['images']['missing_alt']}, сломанных ссылок: {data['links']['broken']}")
+    if data.get('unchanged'):
+        lines.append("- Без изменений с прошлого аудита")
+    elif data.get('changes'):
+        lines.append(f"- Изменений с прошлого аудита: {len(data['changes'])}")
+    lines.append("")
+    return lines
+
+
+def render_crawl(data):
+    return [f"# Обход сайта {data['host']}", f"- Начальная страница: {data['url']}", ""]
+
+
+def render_done(data):
+    return []
+
+
+def render_error(data):
+    return ["## Аудит прерван", f"Ошибка: {data['error']}", ""]
+
+
+RENDERERS = {
+    'meta': render_meta,
+    'crawl': render_crawl,
+    'timing': render_timing,
+    'seo': render_seo,
+    'images': render_images,
+    'links': render_links,
+    'technical': render_technical,
+    'issues': render_issues,
+    'recommendations': render_recommendations,
+    'changes': render_changes,
+    'page': render_page,
+    'done': render_done,
+    'error': render_error,
+}
+
+
+def render_markdown(records_path, markdown_path, types=None):
+    """Markdown из записей JSONL (types - только указанные типы записей). Файлы читаются и пишутся построчно"""
+    finished = False
+    tmp_path = f"{markdown_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for record in read_records(records_path):
+            finished = finished or record['type'] == 'done'
+            renderer = RENDERERS.get(record['type'])
+            if renderer is None or (types and record['type'] not in types):
+                continue
+            for line in renderer(record['data']):
+                out.write(line + "\n")
+        if not finished:
+            out.write("\n> Аудит не завершен: в отчет попали только готовые этапы.\n")
+    os.replace(tmp_path, markdown_path)
+    return markdown_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown-отчет из записей аудита (JSONL)")
+    parser.add_argument("records", help="Файл записей аудита (.jsonl)")
+    parser.add_argument("-o", "--output", help="Файл отчета (по умолчанию рядом, с расширением .md)")
+    args = parser.parse_args()
+
+    markdown_path = args.output or os.path.splitext(args.records)[0] + '.md'
+    render_markdown(args.records, markdown_path)
+    print(f"Отчет сохранен в файл: {markdown_path}")
+
+
+if __name__ == "__main__":
+    main()
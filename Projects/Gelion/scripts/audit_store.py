@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Хранилище прошлых аудитов лежит рядом с остальным кэшем проекта
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_PATH = os.path.join(PROJECT_DIR, 'data', 'cache', 'audit_store.sqlite')
+
+# Поля, которые не сравниваются между аудитами (подробности по каждому URL)
+IGNORED_KEYS = {'details'}
+
+
+def content_hash(content):
+    """Хэш содержимого страницы"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class AuditStore:
+    """ETag, Last-Modified, хэш содержимого и результат анализа по каждому URL"""
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                analysis TEXT,
+                links TEXT,
+                audited_at REAL
+            )"""
+        )
+        self.conn.commit()
+
+    def get(self, url):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, analysis, links, audited_at FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'analysis': json.loads(row[3]) if row[3] else None,
+            'links': json.loads(row[4]) if row[4] else [],
+            'audited_at': row[5],
+        }
+
+    def put(self, url, etag, last_modified, digest, analysis, links=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                url, etag, last_modified, digest,
+                json.dumps(analysis, ensure_ascii=False),
+                json.dumps(links or [], ensure_ascii=False),
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def conditional_headers(entry):
+    """Заголовки условного запроса по сохраненным ETag/Last-Modified"""
+    result = {}
+    if entry and entry.get('etag'):
+        result['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        result['If-Modified-Since'] = entry['last_modified']
+    return result
+
+
+def _flatten(value, prefix=''):
+    """{'seo': {'title': {'length': 15}}} -> {'seo.title.length': 15}"""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            if key in IGNORED_KEYS:
+                continue
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    return {prefix: value}
+
+
+def diff_analysis(old, new):
+    """Список изменений между двумя результатами анализа: [(поле, было, стало)]"""
+    old_flat = _flatten(old or {})
+    new_flat = _flatten(new or {})
+    changes = []
+    for key in sorted(set(old_flat) | set(new_flat)):
+        if old_flat.get(key) != new_flat.get(key):
+            changes.append((key, old_flat.get(key), new_flat.get(key)))
+    return changes
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import image_probe
+from audit_store import AuditStore
+from html_scan import charset_from_content_type, scan_html, seo_from_scan, technical_from_scan
+from http_fetch import HEADERS, fetch
+from page_timing import timed_fetch
+from site_audit import images_report, links_report
+from site_crawler import crawl
+
+# Размер синтетического сайта по умолчанию
+PAGES = 100
+LINKS_PER_PAGE = 20
+IMAGES_PER_PAGE = 5
+LATENCY = 0.01              # Задержка ответа сервера, секунд
+BROKEN_SHARE = 0.05         # Доля сломанных ссылок
+ANALYZE_PAGES = 20          # Страниц для замера анализаторов по фазам
+
+ANALYZER_PHASES = ('fetch', 'scan', 'seo', 'technical', 'images', 'links')
+PHASE_NAMES = {
+    'fetch': 'Загрузка',
+    'scan': 'Разбор HTML',
+    'seo': 'SEO',
+    'technical': 'Технический',
+    'images': 'Изображения',
+    'links': 'Ссылки',
+}
+MODE_NAMES = {
+    'analyzers': 'Анализаторы site_audit',
+    'crawl': 'Обход сайта',
+    'crawl_incremental_cold': 'Обход --incremental (первый)',
+    'crawl_incremental_warm': 'Обход --incremental (повторный)',
+}
+
+
+class SyntheticSite:
+    """Детерминированный сайт: страницы со ссылками друг на друга, изображения, сломанные ссылки"""
+
+    def __init__(self, pages=PAGES, links=LINKS_PER_PAGE, images=IMAGES_PER_PAGE, broken=BROKEN_SHARE, seed=42):
+        self.pages_count = pages
+        self.links = links
+        self.images = images
+        self.broken = broken
+        self.seed = seed
+        # Изображения частично повторяются между страницами, как на реальных сайтах
+        self.image_pool = max(1, pages * images // 4)
+        rnd = random.Random(seed)
+        self.image_sizes = [rnd.randint(20, 400) * 1024 for _ in range(self.image_pool)]
+        self.pages = [self.build_page(i) for i in range(pages)]
+
+    def build_page(self, i):
+        rnd = random.Random(self.seed * 100003 + i)
+        parts = [
+            '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">',
+            f'<title>Аэродром Гелион — страница {i}</title>',
+            f'<meta name="description" content="Синтетическая страница {i} для замера скорости аудита">',
+            '<meta name="keywords" content="аэродром, тест, бенчмарк">',
+            '<meta name="viewport" content="width=device-width, initial-scale=1">',
+            '<link rel="icon" href="/favicon.ico">',
+            '</head><body>',
+            f'<h1>Страница {i}</h1>',
+        ]
+        for j in range(self.images):
+            alt = f' alt="Фото {j}"' if rnd.random() > 0.2 else ''
+            parts.append(f'<h2>Раздел {j}</h2><p>' + ' '.join('полет' for _ in range(rnd.randint(20, 60))) + '</p>')
+            parts.append(f'<img src="/img/{rnd.randrange(self.image_pool)}.jpg"{alt}>')
+        # Ссылка на следующую страницу - весь сайт достижим при обходе
+        parts.append(f'<a href="/page/{(i + 1) % self.pages_count}.html">Далее</a>')
+        for j in range(self.links):
+            if rnd.random() < self.broken:
+                parts.append(f'<a href="/missing/{i}_{j}.html">Нет страницы</a>')
+            else:
+                parts.append(f'<a href="/page/{rnd.randrange(self.pages_count)}.html">Страница</a>')
+        parts.append('</body></html>')
+        return ''.join(parts).encode('utf-8')
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, как у реальных серверов
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        server = self.server
+        path = self.path.split('?', 1)[0]
+        if path == '/__stats':
+            self.send(200, json.dumps({'requests': server.requests}).encode(), 'application/json', body)
+            return
+
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        site = server.site
+        if path == '/robots.txt':
+            self.send(200, b"User-agent: *\nDisallow: /private/\n", 'text/plain', body)
+        elif path.startswith('/page/') and path.endswith('.html') and path[6:-5].isdigit() and int(path[6:-5]) < site.pages_count:
+            number = int(path[6:-5])
+            etag = f'"page-{number}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send(304, b'', None, False, {'ETag': etag})
+            else:
+                self.send(200, site.pages[number], 'text/html; charset=utf-8', body, {'ETag': etag})
+        elif path.startswith('/img/') and path[5:-4].isdigit() and int(path[5:-4]) < site.image_pool:
+            number = int(path[5:-4])
+            self.send_image(site.image_sizes[number], f'"img-{number}"', body)
+        else:
+            self.send(404, b'Not found', 'text/plain', body)
+
+    def send_image(self, size, etag, body):
+        if self.headers.get('If-None-Match') == etag:
+            self.send(304, b'', None, False, {'ETag': etag})
+        elif self.headers.get('Range') == 'bytes=0-0':
+            self.send(206, b'\0', 'image/jpeg', body, {'ETag': etag, 'Content-Range': f"bytes 0-0/{size}"})
+        else:
+            self.send(200, b'\0' * size, 'image/jpeg', body, {'ETag': etag})
+
+    def send(self, status, content, content_type, body, extra_headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+
+class SiteServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+def serve(site_options, latency, port_queue):
+    """Сервер синтетического сайта (запускается в отдельном процессе, чтобы не мешать замерам)"""
+    server = SiteServer(('127.0.0.1', 0), SiteHandler)
+    server.site = SyntheticSite(**site_options)
+    server.latency = latency
+    server.requests = 0
+    server.lock = threading.Lock()
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_server(site_options, latency):
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(site_options, latency, port_queue), daemon=True)
+    process.start()
+    port = port_queue.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def server_requests(base_url):
+    """Сколько запросов сервер обработал с момента запуска"""
+    return fetch(f"{base_url}/__stats").json()['requests']
+
+
+def peak_rss_mb():
+    """Пиковое потребление памяти процессом (за все время работы), МБ"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return round(peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def measure_mode(base_url, pages, func):
+    """Общие метрики режима: страниц/с, запросов/с, пиковая память"""
+    requests_before = server_requests(base_url)
+    start = time.perf_counter()
+    phases = func()
+    elapsed = time.perf_counter() - start
+    requests_made = server_requests(base_url) - requests_before
+    return {
+        'pages': pages,
+        'elapsed': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2),
+        'requests': requests_made,
+        'requests_per_sec': round(requests_made / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(),
+        'phases': phases,
+    }
+
+
+def run_analyzers(base_url, pages):
+    """Анализаторы site_audit по одной странице за раз, с замером каждой фазы"""
+    phases = dict.fromkeys(ANALYZER_PHASES, 0.0)
+    for i in range(pages):
+        url = f"{base_url}/page/{i}.html"
+
+        start = time.perf_counter()
+        response = timed_fetch(url, HEADERS)
+        phases['fetch'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        scan = scan_html(response.content, charset_from_content_type(response.headers.get('content-type')))
+        phases['scan'] += time.perf_counter() - start
+
+        for phase, analyzer in (
+            ('seo', lambda: seo_from_scan(scan)),
+            ('technical', lambda: technical_from_scan(scan)),
+            ('images', lambda: images_report(scan.images, url)),
+            ('links', lambda: links_report(scan.anchors, url)),
+        ):
+            start = time.perf_counter()
+            analyzer()
+            phases[phase] += time.perf_counter() - start
+    return {phase: round(value, 3) for phase, value in phases.items()}
+
+
+def run_crawl(base_url, pages, work_dir, name, store=None):
+    """Обход всего сайта; построчный вывод обхода не печатается"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        stats = asyncio.run(crawl(
+            f"{base_url}/page/0.html",
+            os.path.join(work_dir, f"{name}.jsonl"),
+            max_pages=pages,
+            max_depth=pages,
+            store=store,
+        ))
+    if stats['pages'] != pages:
+        raise SystemExit(f"Обход нашел {stats['pages']} страниц из {pages} (ошибок: {stats['errors']})")
+    return None
+
+
+def run_benchmark(site_options, latency, analyze_pages):
+    """Все режимы на одном сервере. Кэши и хранилище аудитов - во временной папке"""
+    process, base_url = start_server(site_options, latency)
+    pages = site_options['pages']
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            image_probe.CACHE_PATH = os.path.join(work_dir, 'image_probe.json')
+            analyze_pages = min(analyze_pages, pages)
+            results['analyzers'] = measure_mode(base_url, analyze_pages, lambda: run_analyzers(base_url, analyze_pages))
+
+            image_probe.CACHE_PATH = os.path.join(work_dir, 'image_probe_crawl.json')
+            results['crawl'] = measure_mode(base_url, pages, lambda: run_crawl(base_url, pages, work_dir, 'crawl'))
+
+            image_probe.CACHE_PATH = os.path.join(work_dir, 'image_probe_incremental.json')
+            store = AuditStore(os.path.join(work_dir, 'audit_store.sqlite'))
+            try:
+                for mode in ('crawl_incremental_cold', 'crawl_incremental_warm'):
+                    results[mode] = measure_mode(base_url, pages, lambda: run_crawl(base_url, pages, work_dir, mode, store))
+            finally:
+                store.close()
+    finally:
+        process.terminate()
+        process.join()
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'Режим':<32} {'Страниц/с':>10} {'Запросов/с':>11} {'Запросов':>9} {'Время, с':>9} {'Память, МБ':>11}")
+    for mode, row in results.items():
+        rss = row['peak_rss_mb'] if row['peak_rss_mb'] is not None else 'н/д'
+        line = f"{MODE_NAMES[mode]:<32} {row['pages_per_sec']:>10} {row['requests_per_sec']:>11} {row['requests']:>9} {row['elapsed']:>9} {rss:>11}"
+        old = (baseline or {}).get(mode)
+        if old:
+            line += f"  ({(row['pages_per_sec'] / old['pages_per_sec'] - 1) * 100:+.0f}% к базовому)"
+        print(line)
+
+    phases = results['analyzers']['phases']
+    total = sum(phases.values()) or 1
+    print(f"\nФазы анализаторов ({results['analyzers']['pages']} страниц):")
+    for phase in ANALYZER_PHASES:
+        line = f"   {PHASE_NAMES[phase]:<12} {phases[phase] * 1000:>9.0f} мс  {phases[phase] / total * 100:>5.1f}%"
+        old = (baseline or {}).get('analyzers', {}).get('phases', {}).get(phase)
+        if old:
+            line += f"  ({(phases[phase] / old - 1) * 100:+.0f}% к базовому)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк аудита сайта на локальном синтетическом сайте")
+    parser.add_argument("--pages", type=int, default=PAGES, help="Страниц на сайте")
+    parser.add_argument("--links", type=int, default=LINKS_PER_PAGE, help="Ссылок на странице")
+    parser.add_argument("--images", type=int, default=IMAGES_PER_PAGE, help="Изображений на странице")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Задержка ответа сервера, секунд")
+    parser.add_argument("--broken", type=float, default=BROKEN_SHARE, help="Доля сломанных ссылок (0..1)")
+    parser.add_argument("--analyze-pages", type=int, default=ANALYZE_PAGES, help="Страниц для замера анализаторов")
+    parser.add_argument("--save", help="Сохранить результаты в JSON (базовый замер для сравнения)")
+    parser.add_argument("--compare", help="Сравнить с сохраненным базовым замером (JSON)")
+    args = parser.parse_args()
+
+    site_options = {'pages': args.pages, 'links': args.links, 'images': args.images, 'broken': args.broken}
+    print(f"Синтетический сайт: {args.pages} страниц, {args.links} ссылок и {args.images} изображений на странице, "
+          f"задержка {args.latency * 1000:.0f} мс, сломанных ссылок {args.broken:.0%}")
+    results = run_benchmark(site_options, args.latency, args.analyze_pages)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'config': dict(site_options, latency=args.latency), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в файл: {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from html_scan import scan_html, seo_from_scan, technical_from_scan
+from site_audit import analyze_seo_elements, check_technical_aspects
+
+
+def build_page(sections, seed=42):
+    """Синтетическая страница: заголовки, абзацы, изображения и ссылки"""
+    rnd = random.Random(seed)
+    parts = [
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">',
+        '<title>Аэродром Гелион — тестовая страница</title>',
+        '<meta name="description" content="Синтетическая страница для замера скорости анализа">',
+        '<meta name="keywords" content="аэродром, тест, бенчмарк">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        '<link rel="shortcut icon" href="/favicon.ico">',
+        '<script type="application/ld+json">{"@type": "Organization"}</script>',
+        '</head><body><h1>Аэродром <span>«Гелион»</span></h1>',
+    ]
+    for i in range(sections):
+        parts.append(f'<section><h2>Раздел {i}</h2><h3>Подраздел {i}</h3>')
+        parts.append('<p>' + ' '.join('полет' for _ in range(rnd.randint(20, 60))) + '</p>')
+        alt = f' alt="Фото {i}"' if rnd.random() > 0.2 else ''
+        parts.append(f'<img src="/img/photo_{i}.jpg"{alt}>')
+        for j in range(5):
+            parts.append(f'<a href="/page_{i}_{j}.html">Ссылка {j}</a>')
+        parts.append('</section>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def soup_path(content):
+    """Текущий путь: DOM BeautifulSoup и отдельные обходы дерева на каждый анализатор"""
+    soup = BeautifulSoup(content.decode('utf-8'), 'html.parser')
+    seo = analyze_seo_elements(soup)
+    tech = check_technical_aspects(soup)
+    images = [(img.get('src', ''), img.get('alt', '')) for img in soup.find_all('img')]
+    hrefs = [link.get('href', '') for link in soup.find_all('a', href=True)]
+    return seo, tech, images, hrefs
+
+
+def scan_path(content):
+    """Новый путь: один потоковый проход по байтам"""
+    scan = scan_html(content, 'utf-8')
+    return seo_from_scan(scan), technical_from_scan(scan), scan.images, scan.anchors
+
+
+def measure(func, content, repeat):
+    """Лучшее время из repeat запусков"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение BeautifulSoup и однопроходного анализатора")
+    parser.add_argument("--sections", type=int, nargs="+", default=[100, 1000, 5000], help="Размеры страниц (число разделов)")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов на замер")
+    args = parser.parse_args()
+
+    print(f"{'Разделов':>9} {'Размер, КБ':>11} {'Soup, мс':>10} {'Scan, мс':>10} {'Ускорение':>10}")
+    for sections in args.sections:
+        content = build_page(sections)
+        if soup_path(content) != scan_path(content):
+            raise SystemExit(f"Результаты анализаторов расходятся на странице из {sections} разделов")
+        soup_time = measure(soup_path, content, args.repeat)
+        scan_time = measure(scan_path, content, args.repeat)
+        print(f"{sections:>9} {len(content) / 1024:>11.0f} {soup_time * 1000:>10.1f} {scan_time * 1000:>10.1f} {soup_time / scan_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
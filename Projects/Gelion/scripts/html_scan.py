@@ -0,0 +1,151 @@
+import codecs
+from html.parser import HTMLParser
+
+# Размер порции при разборе байтов
+CHUNK_SIZE = 64 * 1024
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+
+class PageScanner(HTMLParser):
+    """Сбор всех данных для аудита за один проход, без построения DOM-дерева"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.meta = {}              # name -> content (первое вхождение)
+        self.headings = {tag: [] for tag in HEADING_TAGS}
+        self.images = []            # [(src, alt)]
+        self.anchors = []           # [href]
+        self.html_found = False
+        self.html_lang = None
+        self.favicon = False
+        self.structured_data = False
+        # Открытые <title>/<hN>, текст которых сейчас собирается: [(tag, parts)]
+        self._captures = []
+        self._title_seen = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HEADING_TAGS or (tag == 'title' and not self._title_seen):
+            self._title_seen = self._title_seen or tag == 'title'
+            self._captures.append((tag, []))
+            return
+
+        attrs = dict(attrs)
+        if tag == 'html' and not self.html_found:
+            self.html_found = True
+            self.html_lang = attrs.get('lang')
+        elif tag == 'meta':
+            name = attrs.get('name')
+            if name and name not in self.meta:
+                self.meta[name] = attrs.get('content') or ''
+        elif tag == 'img':
+            self.images.append((attrs.get('src') or '', attrs.get('alt') or ''))
+        elif tag == 'a':
+            if 'href' in attrs:
+                self.anchors.append(attrs['href'] or '')
+        elif tag == 'link':
+            if 'icon' in (attrs.get('rel') or '').split():
+                self.favicon = True
+        elif tag == 'script':
+            if attrs.get('type') == 'application/ld+json':
+                self.structured_data = True
+
+    def handle_endtag(self, tag):
+        # Закрываем захват по своему тегу; незакрытые вложенные захваты закрываются вместе с ним
+        for i in range(len(self._captures) - 1, -1, -1):
+            if self._captures[i][0] == tag:
+                for capture_tag, parts in self._captures[i:]:
+                    self._finish_capture(capture_tag, parts)
+                del self._captures[i:]
+                return
+
+    def handle_data(self, data):
+        for _, parts in self._captures:
+            parts.append(data)
+
+    def close(self):
+        super().close()
+        for capture_tag, parts in self._captures:
+            self._finish_capture(capture_tag, parts)
+        self._captures = []
+
+    def _finish_capture(self, tag, parts):
+        text = ''.join(parts).strip()
+        if tag == 'title':
+            self.title = text
+        else:
+            self.headings[tag].append(text)
+
+
+def charset_from_content_type(content_type, default='utf-8'):
+    """Кодировка из заголовка Content-Type"""
+    for part in (content_type or '').split(';'):
+        key, _, value = part.strip().partition('=')
+        if key.lower() == 'charset' and value:
+            charset = value.strip('"\' ')
+            try:
+                return codecs.lookup(charset).name
+            except LookupError:
+                break
+    return default
+
+
+def scan_chunks(chunks, encoding='utf-8'):
+    """Разбор HTML из потока байтов (например, response.iter_content)"""
+    scanner = PageScanner()
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    for chunk in chunks:
+        scanner.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+    scanner.feed(decoder.decode(b'', final=True))
+    scanner.close()
+    return scanner
+
+
+def scan_html(content, encoding='utf-8'):
+    """Разбор HTML (bytes или str) за один проход"""
+    if isinstance(content, str):
+        return scan_chunks([content])
+    return scan_chunks(
+        (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)),
+        encoding,
+    )
+
+
+def seo_from_scan(scan):
+    """SEO-отчет в формате analyze_seo_elements"""
+    seo_report = {}
+
+    if scan.title is not None:
+        seo_report['title'] = {'text': scan.title, 'length': len(scan.title)}
+    else:
+        seo_report['title'] = {'text': 'Не найден', 'length': 0}
+
+    for key in ('description', 'keywords'):
+        if key in scan.meta:
+            content = scan.meta[key]
+            seo_report[key] = {'content': content, 'length': len(content)}
+        else:
+            seo_report[key] = {'content': 'Не найдено', 'length': 0}
+
+    seo_report['headings'] = {
+        'h1_count': len(scan.headings['h1']),
+        'h1_text': list(scan.headings['h1']),
+        'h2_count': len(scan.headings['h2']),
+        'h3_count': len(scan.headings['h3']),
+    }
+    return seo_report
+
+
+def technical_from_scan(scan):
+    """Технический отчет в формате check_technical_aspects"""
+    if scan.html_found:
+        html_lang = scan.html_lang if scan.html_lang else 'Не указан'
+    else:
+        html_lang = 'Не найден'
+    return {
+        'viewport': 'viewport' in scan.meta,
+        'html_lang': html_lang,
+        'favicon': scan.favicon,
+        'structured_data': scan.structured_data,
+    }
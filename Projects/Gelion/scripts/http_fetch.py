@@ -0,0 +1,98 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# urllib3 сам распаковывает brotli, если установлен пакет brotli
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Заголовки для имитации реального браузера
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+TIMEOUT = (5, 15)           # (connect, read) в секундах
+POOL_SIZE = 32              # Соединений в пуле на один хост
+MAX_RESPONSE_SIZE = int(os.getenv('FETCH_MAX_RESPONSE_SIZE', 10 * 1024 * 1024))
+
+# Повторы при сетевых сбоях и ответах 429/5xx, с экспоненциальной паузой (0.5, 1, 2 с...)
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ResponseTooLarge(requests.RequestException):
+    """Ответ больше допустимого размера"""
+
+
+def make_retry(total=RETRIES):
+    return Retry(
+        total=total,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=('HEAD', 'GET'),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def make_session(pool_size=POOL_SIZE, retries=RETRIES):
+    """Сессия с пулом keep-alive соединений и повторами.
+    Прокси берутся только из окружения (HTTP_PROXY/HTTPS_PROXY/NO_PROXY)"""
+    session = requests.Session()
+    session.trust_env = True
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=make_retry(retries))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(retries=RETRIES):
+    """Общая сессия процесса - соединения переиспользуются между всеми вызовами"""
+    session = _sessions.get(retries)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(retries)
+            if session is None:
+                session = _sessions[retries] = make_session(retries=retries)
+    return session
+
+
+def fetch(url, session=None, max_size=MAX_RESPONSE_SIZE, timeout=TIMEOUT, **kwargs):
+    """GET с ограничением размера ответа. Тело доступно как обычно: response.content / response.text"""
+    session = session or get_session()
+    response = session.get(url, timeout=timeout, stream=True, **kwargs)
+    try:
+        declared = response.headers.get('content-length')
+        if max_size and declared and declared.isdigit() and int(declared) > max_size:
+            raise ResponseTooLarge(f"Ответ {url} больше {max_size} байт ({declared})", response=response)
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(64 * 1024):
+            received += len(chunk)
+            if max_size and received > max_size:
+                raise ResponseTooLarge(f"Ответ {url} больше {max_size} байт", response=response)
+            chunks.append(chunk)
+        response._content = b''.join(chunks)
+    finally:
+        response.close()
+    return response
+
+
+def head(url, session=None, timeout=TIMEOUT, **kwargs):
+    """HEAD через общую сессию"""
+    session = session or get_session()
+    return session.head(url, timeout=timeout, **kwargs)
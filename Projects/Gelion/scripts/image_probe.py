@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from http_fetch import get_session
+from link_checker import HEAD_REJECTED_CODES, PER_HOST_LIMIT, RETRIES, TIMEOUT, normalize_url
+
+# Кэш результатов лежит рядом с данными проекта, а не в текущей папке
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(PROJECT_DIR, 'data', 'cache', 'image_probe.json')
+
+IMAGE_LIMIT = 16            # Одновременных проверок изображений
+CACHE_TTL = 24 * 60 * 60    # Сколько секунд запись считается свежей без перепроверки
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+
+_save_lock = threading.Lock()
+
+
+def load_cache(path=CACHE_PATH):
+    """Чтение кэша проверок изображений"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    """Атомарная запись кэша (через временный файл).
+    Страницы обхода сохраняют кэш параллельно: запись под блокировкой и слиянием с файлом на диске,
+    из двух записей об одном URL остается более свежая - чужие записи не теряются"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _save_lock:
+        merged = load_cache(path)
+        for url, entry in cache.items():
+            if entry.get('checked_at', 0) >= merged.get(url, {}).get('checked_at', 0):
+                merged[url] = entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def _same_validators(entry, etag, last_modified):
+    """Совпадают ли ETag/Last-Modified с сохраненными в кэше"""
+    if not entry:
+        return False
+    if etag:
+        return etag == entry.get('etag')
+    if last_modified:
+        return last_modified == entry.get('last_modified')
+    return False
+
+
+def _range_size(session, url, timeout):
+    """Размер через GET с Range: bytes=0-0 (сервер отдает 1 байт и полный размер в Content-Range)"""
+    response = session.get(url, headers={'Range': 'bytes=0-0'}, timeout=timeout, stream=True)
+    response.close()
+    content_range = response.headers.get('content-range', '')
+    match = CONTENT_RANGE_RE.search(content_range)
+    if match:
+        return int(match.group(1)), response
+    # Сервер проигнорировал Range и ответил 200 - берем content-length
+    content_length = response.headers.get('content-length')
+    if response.status_code == 200 and content_length:
+        return int(content_length), response
+    return None, response
+
+
+def _probe(session, url, timeout, entry):
+    """Определение веса изображения с учетом кэша"""
+    conditional = {}
+    if entry and entry.get('etag'):
+        conditional['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        conditional['If-Modified-Since'] = entry['last_modified']
+
+    response = session.head(url, headers=conditional, timeout=timeout, allow_redirects=True)
+    etag = response.headers.get('etag')
+    last_modified = response.headers.get('last-modified')
+
+    # Изображение не изменилось - размер берем из кэша
+    if entry and (response.status_code == 304 or _same_validators(entry, etag, last_modified)):
+        return dict(entry, checked_at=time.time(), from_cache=True)
+
+    size = None
+    content_length = response.headers.get('content-length')
+    if response.status_code < 400 and content_length:
+        size = int(content_length)
+    elif response.status_code < 400 or response.status_code in HEAD_REJECTED_CODES:
+        size, response = _range_size(session, url, timeout)
+        etag = etag or response.headers.get('etag')
+        last_modified = last_modified or response.headers.get('last-modified')
+
+    return {
+        'size': size,
+        'status': response.status_code,
+        'etag': etag,
+        'last_modified': last_modified,
+        'checked_at': time.time(),
+        'from_cache': False,
+    }
+
+
+def _error_result(error):
+    """Результат изображения, которое не удалось проверить: ошибка остается на нем, а не роняет всю проверку"""
+    message = str(error) if isinstance(error, requests.RequestException) else f"{type(error).__name__}: {error}"
+    return {'size': None, 'status': None, 'error': message, 'checked_at': time.time(), 'from_cache': False}
+
+
+async def probe_images(urls, limit=IMAGE_LIMIT, timeout=TIMEOUT, cache_path=None, ttl=CACHE_TTL, session=None):
+    """Параллельная проверка веса изображений. Возвращает {url: {size, status, ...}}.
+    cache_path=None - кэш по умолчанию (CACHE_PATH), пустая строка - без кэша"""
+    if cache_path is None:
+        cache_path = CACHE_PATH
+    results = {}
+    normalized = []
+    for url in urls:
+        try:
+            normalized.append(normalize_url(url))
+        except ValueError as e:
+            # Например, нечисловой порт: http://cdn.example.com:bad/i.png
+            results[url] = _error_result(e)
+    unique_urls = list(dict.fromkeys(normalized))
+    cache = load_cache(cache_path) if cache_path else {}
+    now = time.time()
+
+    to_probe = []
+    for url in unique_urls:
+        entry = cache.get(url)
+        if entry and entry.get('size') is not None and now - entry.get('checked_at', 0) < ttl:
+            results[url] = dict(entry, from_cache=True)
+        else:
+            to_probe.append(url)
+
+    session = session or get_session(RETRIES)
+
+    semaphore = asyncio.Semaphore(limit)
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(PER_HOST_LIMIT))
+    # Свой пул потоков на limit проверок, а не общий пул asyncio.to_thread (min(32, CPU + 4) потоков)
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=limit, thread_name_prefix='image_probe')
+
+    async def worker(url):
+        async with host_semaphores[urlparse(url).netloc], semaphore:
+            try:
+                return url, await loop.run_in_executor(pool, _probe, session, url, timeout, cache.get(url))
+            except Exception as e:
+                # Не только сетевые ошибки: например, ValueError от Content-Length вида "123, 123"
+                return url, _error_result(e)
+
+    try:
+        probed = await asyncio.gather(*(worker(u) for u in to_probe))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    for url, result in probed:
+        results[url] = result
+        # Ошибки сети в кэш не пишем, чтобы перепроверить в следующий раз
+        if result.get('size') is not None:
+            cache[url] = {k: v for k, v in result.items() if k != 'from_cache'}
+
+    if cache_path and to_probe:
+        save_cache(cache, cache_path)
+    return results
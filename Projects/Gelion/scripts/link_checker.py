@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urlunparse
+
+import requests
+
+from http_fetch import get_session
+
+# Лимиты проверки ссылок
+PER_HOST_LIMIT = 4          # Одновременных запросов к одному хосту
+TOTAL_LIMIT = 32            # Одновременных запросов всего
+TIMEOUT = (5, 10)           # (connect, read) в секундах
+
+# Повторов на ссылку: сломанная ссылка не должна ждать полный цикл backoff
+RETRIES = 1
+
+# Коды, с которыми сервер отклоняет HEAD - повторяем запрос через GET
+HEAD_REJECTED_CODES = {403, 405, 501}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Расширения, которые точно не являются HTML-страницами
+SKIP_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.pdf', '.zip', '.rar',
+    '.doc', '.docx', '.xls', '.xlsx', '.mp3', '.mp4', '.avi', '.css', '.js', '.xml',
+)
+
+
+def normalize_url(url):
+    """Приведение URL к каноническому виду для дедупликации"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    port = parsed.port
+    netloc = host if not port or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = parsed.path or '/'
+    # Фрагмент (#...) не влияет на ответ сервера
+    return urlunparse((scheme, netloc, path, parsed.params, parsed.query, ''))
+
+
+def extract_links(hrefs, page_url, host):
+    """Внутренние ссылки страницы в каноническом виде"""
+    links = []
+    for href in hrefs:
+        try:
+            full_url = normalize_url(urljoin(page_url, href))
+        except ValueError:
+            # Ссылка не разбирается (например, http://other.com:bad/) - пропускаем ее, а не всю страницу
+            continue
+        parsed = urlparse(full_url)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc != host:
+            continue
+        if parsed.path.lower().endswith(SKIP_EXTENSIONS):
+            continue
+        links.append(full_url)
+    return links
+
+
+def _probe(session, url, timeout):
+    """HEAD-запрос с откатом на GET, если сервер не поддерживает HEAD"""
+    start = time.perf_counter()
+    method = 'HEAD'
+    response = session.head(url, timeout=timeout, allow_redirects=True)
+    if response.status_code in HEAD_REJECTED_CODES:
+        method = 'GET'
+        # stream=True - тело не скачиваем, нужен только статус
+        response = session.get(url, timeout=timeout, allow_redirects=True, stream=True)
+        response.close()
+    latency = time.perf_counter() - start
+    return {'status': response.status_code, 'latency': round(latency, 3), 'method': method, 'error': None}
+
+
+async def check_urls(urls, per_host_limit=PER_HOST_LIMIT, total_limit=TOTAL_LIMIT, timeout=TIMEOUT, session=None):
+    """Параллельная проверка списка URL. Возвращает {url: {status, latency, method, error}}"""
+    unique_urls = list(dict.fromkeys(normalize_url(u) for u in urls))
+    session = session or get_session(RETRIES)
+
+    total_semaphore = asyncio.Semaphore(total_limit)
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(per_host_limit))
+    # Свой пул потоков на total_limit: пул asyncio.to_thread по умолчанию - min(32, CPU + 4) потоков,
+    # и лимиты выше этого числа не достигались бы
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=total_limit, thread_name_prefix='link_checker')
+
+    async def worker(url):
+        async with host_semaphores[urlparse(url).netloc], total_semaphore:
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(pool, _probe, session, url, timeout)
+            except Exception as e:
+                # Любая ошибка (не только сетевая, например InvalidURL или LocationParseError) - результат этой ссылки,
+                # а не падение всей проверки
+                result = {
+                    'status': None,
+                    'latency': round(time.perf_counter() - start, 3),
+                    'method': 'HEAD',
+                    'error': str(e) if isinstance(e, requests.RequestException) else f"{type(e).__name__}: {e}",
+                }
+            return url, result
+
+    try:
+        results = await asyncio.gather(*(worker(u) for u in unique_urls))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return dict(results)
+
+
+def is_working(result):
+    """Ссылка рабочая, если сервер ответил кодом < 400"""
+    return result['status'] is not None and result['status'] < 400
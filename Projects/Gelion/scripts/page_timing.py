@@ -0,0 +1,219 @@
+import base64
+import http.client
+import socket
+import ssl
+import time
+import zlib
+from urllib.parse import urljoin, urlparse
+from urllib.request import getproxies, proxy_bypass
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from http_fetch import HEADERS, MAX_RESPONSE_SIZE, ResponseTooLarge
+
+PHASES = ('dns', 'connect', 'proxy', 'tls', 'ttfb', 'download', 'total')
+PHASE_NAMES = {
+    'dns': 'DNS',
+    'connect': 'TCP-соединение',
+    'proxy': 'Туннель прокси',
+    'tls': 'TLS-рукопожатие',
+    'ttfb': 'Первый байт (TTFB)',
+    'download': 'Загрузка тела',
+    'total': 'Всего',
+}
+
+MAX_REDIRECTS = 5
+READ_CHUNK = 64 * 1024
+
+
+class TimedResponse:
+    """Ответ сервера с разбивкой времени загрузки по фазам"""
+
+    def __init__(self, url, status, headers, content, timings, wire_bytes):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.content = content
+        self.timings = timings
+        self.wire_bytes = wire_bytes
+
+
+def _proxy_for(parsed):
+    """Прокси из переменных окружения (HTTP_PROXY/HTTPS_PROXY/NO_PROXY)"""
+    proxy = getproxies().get(parsed.scheme)
+    if not proxy or proxy_bypass(parsed.hostname):
+        return None
+    return urlparse(proxy if '://' in proxy else f"http://{proxy}")
+
+
+def _proxy_auth(proxy):
+    if not proxy.username:
+        return {}
+    token = base64.b64encode(f"{proxy.username}:{proxy.password or ''}".encode()).decode()
+    return {'Proxy-Authorization': f"Basic {token}"}
+
+
+def _open_tunnel(sock, host, port, proxy):
+    """CONNECT через HTTP-прокси для HTTPS"""
+    lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+    lines += [f"{k}: {v}" for k, v in _proxy_auth(proxy).items()]
+    sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    reply = b''
+    while b'\r\n\r\n' not in reply:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        reply += chunk
+    status_line = reply.split(b'\r\n', 1)[0].decode('latin-1')
+    parts = status_line.split()
+    if len(parts) < 2 or parts[1] != '200':
+        raise OSError(f"Прокси отклонил CONNECT: {status_line}")
+
+
+def _decode_body(body, encoding):
+    encoding = (encoding or '').lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    if encoding == 'br' and brotli:
+        return brotli.decompress(body)
+    return body
+
+
+def _fetch_once(url, request_headers, timeout):
+    """Один HTTP-запрос с замером каждой фазы"""
+    parsed = urlparse(url)
+    host = parsed.hostname
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    proxy = _proxy_for(parsed)
+    timings = dict.fromkeys(PHASES, 0.0)
+
+    target_host, target_port = (proxy.hostname, proxy.port or 80) if proxy else (host, port)
+
+    start = time.perf_counter()
+    addrinfo = socket.getaddrinfo(target_host, target_port, type=socket.SOCK_STREAM)
+    timings['dns'] = time.perf_counter() - start
+
+    # Адреса по порядку (IPv6/IPv4): недоступный адрес - попытка со следующим, как в socket.create_connection
+    mark = time.perf_counter()
+    sock, error = None, None
+    for family, socktype, proto, _, sockaddr in addrinfo:
+        candidate = socket.socket(family, socktype, proto)
+        candidate.settimeout(timeout)
+        try:
+            candidate.connect(sockaddr)
+        except OSError as e:
+            candidate.close()
+            error = e
+            continue
+        sock = candidate
+        break
+    if sock is None:
+        raise error or OSError(f"Нет адресов для {target_host}")
+    try:
+        timings['connect'] = time.perf_counter() - mark
+
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        extra_headers = {}
+
+        if parsed.scheme == 'https':
+            if proxy:
+                mark = time.perf_counter()
+                _open_tunnel(sock, host, port, proxy)
+                timings['proxy'] = time.perf_counter() - mark
+            mark = time.perf_counter()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            timings['tls'] = time.perf_counter() - mark
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        else:
+            if proxy:
+                # Через HTTP-прокси запрашиваем абсолютный URL
+                path = url
+                extra_headers = _proxy_auth(proxy)
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+
+        accept_encoding = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+        mark = time.perf_counter()
+        conn.request('GET', path, headers={
+            **request_headers,
+            **extra_headers,
+            'Accept-Encoding': accept_encoding,
+            'Connection': 'close',
+        })
+        response = conn.getresponse()
+        timings['ttfb'] = time.perf_counter() - mark
+
+        # Тот же предел размера ответа, что у http_fetch.fetch (FETCH_MAX_RESPONSE_SIZE)
+        declared = response.getheader('content-length')
+        if MAX_RESPONSE_SIZE and declared and declared.isdigit() and int(declared) > MAX_RESPONSE_SIZE:
+            raise ResponseTooLarge(f"Ответ {url} больше {MAX_RESPONSE_SIZE} байт ({declared})")
+        mark = time.perf_counter()
+        chunks = []
+        received = 0
+        while True:
+            chunk = response.read(READ_CHUNK)
+            if not chunk:
+                break
+            received += len(chunk)
+            if MAX_RESPONSE_SIZE and received > MAX_RESPONSE_SIZE:
+                raise ResponseTooLarge(f"Ответ {url} больше {MAX_RESPONSE_SIZE} байт")
+            chunks.append(chunk)
+        timings['download'] = time.perf_counter() - mark
+        body = b''.join(chunks)
+    finally:
+        sock.close()
+
+    timings['total'] = time.perf_counter() - start
+    content = _decode_body(body, response.getheader('content-encoding'))
+    return TimedResponse(url, response.status, response.headers, content, timings, len(body))
+
+
+def timed_fetch(url, request_headers=None, timeout=15):
+    """GET с разбивкой по фазам: DNS, TCP, TLS, TTFB, загрузка тела.
+    Редиректы обрабатываются, в timings попадает последний запрос, время редиректов - в 'redirects'"""
+    request_headers = request_headers or HEADERS
+    redirects_time = 0.0
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _fetch_once(url, request_headers, timeout)
+        location = response.headers.get('location')
+        if response.status_code not in (301, 302, 303, 307, 308) or not location:
+            response.timings['redirects'] = redirects_time
+            response.timings['total'] += redirects_time
+            return response
+        redirects_time += response.timings['total']
+        url = urljoin(url, location)
+    raise OSError(f"Слишком много редиректов: {url}")
+
+
+def percentile(values, p):
+    """Перцентиль с линейной интерполяцией"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def sample_timings(url, samples, request_headers=None, timeout=15):
+    """N замеров подряд: p50/p90/p99 по каждой фазе и скорость загрузки"""
+    runs = [timed_fetch(url, request_headers, timeout) for _ in range(samples)]
+    summary = {}
+    for phase in PHASES + ('redirects',):
+        values = [r.timings[phase] for r in runs]
+        summary[phase] = {f"p{p}": percentile(values, p) for p in (50, 90, 99)}
+    throughputs = [r.wire_bytes / r.timings['total'] for r in runs if r.timings['total'] > 0]
+    summary['bytes_per_sec'] = {f"p{p}": percentile(throughputs, p) for p in (50, 90, 99)}
+    summary['samples'] = samples
+    return summary, runs[-1]
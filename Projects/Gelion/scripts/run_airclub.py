@@ -2,6 +2,8 @@ import sys
 import signal
 import os
 import asyncio
+import argparse
+from pathlib import Path
 
 # ==============================================================================
 # 1. WINDOWS FIX (Критично для 2025 года)
@@ -14,7 +16,7 @@ if sys.platform.startswith('win'):
             except AttributeError: setattr(signal, name, 1)
 
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process, LLM
+from crewai import Agent, Task, LLM
 
 # ==============================================================================
 # 2. НАСТРОЙКА ПУТЕЙ
@@ -26,6 +28,17 @@ AGENCY_ROOT = os.path.dirname(os.path.dirname(current_dir))
 BRAIN_DIR = os.path.join(AGENCY_ROOT, "Agency_Brain")
 ENV_PATH = os.path.join(AGENCY_ROOT, ".env")
 
+# Папки запусков и чекпоинты - общие с лаунчером src/main.py
+SRC_DIR = os.path.abspath(os.path.join(current_dir, "..", "..", "..", "src"))
+sys.path.insert(0, SRC_DIR)
+from run_store import RunStore, chain_hashes, find_run_dir
+from scheduler import run_dag
+from brain_index import search_brain
+from prompts import get_prompt_registry
+
+# Сколько фрагментов базы знаний (Agency_Brain, Projects/*/data) добавить в backstory агента
+KNOWLEDGE_TOP_K = 3
+
 # Создаем папки, если их нет
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -37,15 +50,13 @@ if os.path.exists(ENV_PATH):
 else:
     print("⚠️ Файл .env не найден! Проверь пути.")
 
-# Функция чтения промптов
-def load_agent_prompt(filename):
-    path = os.path.join(CONFIG_DIR, filename)
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        # Создаем заглушку, чтобы код не падал при первом старте
-        return f"Ты профессиональный агент. Твоя роль: {filename.replace('.md', '')}."
+# Промпты агентов из configs/ через общий реестр: файл читается один раз, отсутствующий файл - ошибка
+prompts = get_prompt_registry(CONFIG_DIR)
+
+def with_knowledge(backstory, query):
+    """Backstory + самые релевантные фрагменты базы знаний вместо целых файлов"""
+    snippets = search_brain(query, KNOWLEDGE_TOP_K)
+    return f"{backstory}\n\nБаза знаний агентства:\n{snippets}" if snippets else backstory
 
 print(f"--- ЗАПУСК ПРОЕКТА: AIRCLUB ---")
 
@@ -81,11 +92,12 @@ llm_deepseek = LLM(
 # ==============================================================================
 # 4. АГЕНТЫ
 # ==============================================================================
+topic = "Сайт для элитного частного Аэроклуба"
 
 agent_skeptic = Agent(
     role='Business Analyst (Skeptic)',
     goal='Найти риски и слабые места',
-    backstory=load_agent_prompt("role_skeptic.md"),
+    backstory=with_knowledge(prompts.render("role_skeptic.md", topic=topic), "риски бизнес аэроклуб"),
     llm=llm_gemini,
     verbose=True
 )
@@ -93,7 +105,7 @@ agent_skeptic = Agent(
 agent_innovator = Agent(
     role='Creative Director',
     goal='Придумать уникальные фишки',
-    backstory=load_agent_prompt("role_innovator.md"),
+    backstory=with_knowledge(prompts.render("role_innovator.md", topic=topic), "luxury премиум фишки сайт"),
     llm=llm_groq, 
     verbose=True
 )
@@ -101,7 +113,7 @@ agent_innovator = Agent(
 agent_boss = Agent(
     role='Project Manager',
     goal='Синтезировать отчет и принять решение',
-    backstory=load_agent_prompt("role_boss.md"),
+    backstory=with_knowledge(prompts.render("role_boss.md", topic=topic), "концепция сайта позиционирование конверсия"),
     llm=llm_gpt4,
     verbose=True
 )
@@ -110,7 +122,7 @@ agent_boss = Agent(
 agent_coder = Agent(
     role="Senior Tech Lead",
     goal="Составить технический стек на основе концепции",
-    backstory=load_agent_prompt("role_tech_lead.md"),
+    backstory=with_knowledge(prompts.render("role_tech_lead.md", topic=topic), "технический стек astro frontend backend"),
     llm=llm_deepseek,
     verbose=True
 )
@@ -118,7 +130,6 @@ agent_coder = Agent(
 # ==============================================================================
 # 5. ЗАДАЧИ
 # ==============================================================================
-topic = "Сайт для элитного частного Аэроклуба"
 
 # Задача 1: Анализ рисков (Параллельно)
 task_skeptic = Task(
@@ -159,22 +170,76 @@ task_coder = Task(
 # ==============================================================================
 # 6. ЗАПУСК
 # ==============================================================================
-crew = Crew(
-    agents=[agent_skeptic, agent_innovator, agent_boss, agent_coder], # Все в сборе
-    tasks=[task_skeptic, task_innovator, task_boss, task_coder],      # Порядок важен
-    verbose=True,
-    process=Process.hierarchical, # Можно sequential (по умолчанию) или hierarchical
-    manager_llm=llm_gpt4          # Нужен только если process=Process.hierarchical
-)
+# Ключи задач для чекпоинтов: ключ -> задача
+TASKS = {
+    "risks": task_skeptic,
+    "ideas": task_innovator,
+    "concept": task_boss,
+    "tech_stack": task_coder,
+}
+
+# Разделитель результатов задач в context, как у CrewAI
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+
+def task_graph():
+    """Ключ задачи -> ключи задач из ее context"""
+    keys = {id(task): key for key, task in TASKS.items()}
+    return {key: [keys[id(dep)] for dep in task.context or []] for key, task in TASKS.items()}
+
+def task_hashes():
+    """Хэш задачи: описание, агент, модель и хэши задач из context.
+    Правка задачи инвалидирует ее и все задачи ниже по цепочке"""
+    definitions = {
+        key: {
+            "description": task.description,
+            "expected_output": task.expected_output,
+            "agent": [task.agent.role, task.agent.goal, task.agent.backstory],
+            "llm": task.agent.llm.model,
+        }
+        for key, task in TASKS.items()
+    }
+    return chain_hashes(definitions, task_graph())
+
+def run_with_checkpoints(resume_id=None):
+    """Запуск с сохранением результата каждой задачи. С resume_id готовые задачи
+    с неизменным определением не выполняются, их результат подставляется в context.
+    Задачи без общих зависимостей (риски и идеи) выполняются параллельно"""
+    hashes = task_hashes()
+    flow_dir = Path(OUTPUT_DIR) / "airclub"
+    if resume_id:
+        run = RunStore.open(find_run_dir(Path(OUTPUT_DIR), resume_id))
+        completed = run.prepare_resume(list(TASKS), hashes)
+    else:
+        run = RunStore(flow_dir, "airclub", list(TASKS), {"topic": topic}, task_hashes=hashes)
+        completed = {}
+    print(f"📁 Папка запуска: {run.run_dir} (продолжить: --resume {run.run_id})")
+
+    def run_task(key, context_outputs):
+        if key in completed:
+            print(f"♻️ Из чекпоинта: {key}")
+            return completed[key]
+        task = TASKS[key]
+        context = CONTEXT_DIVIDER.join(str(output) for output in context_outputs) or None
+        run.task_started(key)
+        try:
+            output = task.execute_sync(agent=task.agent, context=context)
+        except Exception as e:
+            run.task_failed(key, e)
+            raise
+        run.task_finished(key, output.raw)
+        return output.raw
 
-# Для простого последовательного запуска лучше убрать process=Process.hierarchical
-# Давай используем простой Sequential для начала, чтобы меньше багов
-crew = Crew(
-    agents=[agent_skeptic, agent_innovator, agent_boss, agent_coder],
-    tasks=[task_skeptic, task_innovator, task_boss, task_coder],
-    verbose=True
-)
+    try:
+        run_dag(task_graph(), run_task, max_workers=len(TASKS))
+    except Exception as e:
+        report = run.finish("failed", str(e))
+        print(f"⚠️ Частичный отчет: {report}")
+        raise
+    return run.finish("done")
 
 if __name__ == "__main__":
-    crew.kickoff()
-    print(f"\n✅ Готово! Проверь папку: {OUTPUT_DIR}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AirClub crew")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Продолжить упавший запуск с чекпоинтов")
+    args = parser.parse_args()
+    report = run_with_checkpoints(args.resume)
+    print(f"\n✅ Готово! Отчет: {report}, файлы задач: {OUTPUT_DIR}")
\ No newline at end of file
@@ -25,6 +25,12 @@ OUTPUT_DIR = os.path.join(current_dir, "output")
 AGENCY_ROOT = os.path.dirname(os.path.dirname(current_dir)) 
 ENV_PATH = os.path.join(AGENCY_ROOT, ".env")
 
+# Сжатие context - общее с лаунчером src/main.py
+SRC_DIR = os.path.abspath(os.path.join(current_dir, "..", "..", "..", "src"))
+sys.path.insert(0, SRC_DIR)
+from context_compress import CONTEXT_TOKEN_BUDGET, compress_parts, format_stats
+from prompts import get_prompt_registry
+
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
@@ -60,13 +66,8 @@ llm_gpt4 = LLM(
     api_key=os.getenv("OPENAI_API_KEY")
 )
 
-def load_prompt(name):
-    path = os.path.join(CONFIG_DIR, name)
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return "You are an expert agent."
+# Промпты агентов из configs/ через общий реестр: файл читается один раз, отсутствующий файл - ошибка
+prompts = get_prompt_registry(CONFIG_DIR)
 
 # ==============================================================================
 # 4. АГЕНТЫ
@@ -76,7 +77,7 @@ def load_prompt(name):
 agent_scout = Agent(
     role="Global Web Scout",
     goal="Найти сайты лучших аэроклубов мира и собрать их контент",
-    backstory=load_prompt("role_scout.md"),
+    backstory=prompts.render("role_scout.md"),
     llm=llm_gemini, # <--- СМЕНИЛИ МОДЕЛЬ
     tools=[search_tool, scrape_tool], 
     verbose=True,
@@ -86,7 +87,7 @@ agent_scout = Agent(
 agent_analyst = Agent(
     role="Business Analyst (Luxury Aviation)",
     goal="Сравнить наш сайт с конкурентами и найти точки роста",
-    backstory=load_prompt("role_analyst.md"),
+    backstory=prompts.render("role_analyst.md"),
     llm=llm_deepseek,
     verbose=True
 )
@@ -94,7 +95,7 @@ agent_analyst = Agent(
 agent_strategist = Agent(
     role="Chief Strategy Officer",
     goal="Разработать стратегию трансформации аэроклуба",
-    backstory=load_prompt("role_strategist.md"),
+    backstory=prompts.render("role_strategist.md"),
     llm=llm_gpt4,
     verbose=True
 )
@@ -154,13 +155,35 @@ task_strategy = Task(
 # ==============================================================================
 # 6. ЗАПУСК
 # ==============================================================================
+# Сначала разведка, затем сжатие собранного текста под бюджет анализа и анализ со стратегией.
+# Без сжатия в task_analysis уходит весь сырой текст всех сайтов
+crew_scouting = Crew(
+    agents=[agent_scout],
+    tasks=tasks,
+    verbose=True
+)
+
 crew = Crew(
-    agents=[agent_scout, agent_analyst, agent_strategist],
-    tasks=[*tasks, task_analysis, task_strategy], 
+    agents=[agent_analyst, agent_strategist],
+    tasks=[task_analysis, task_strategy],
     verbose=True
 )
 
+def compress_scouting_outputs(budget=CONTEXT_TOKEN_BUDGET):
+    """Результаты разведки заменяются сжатыми: task_analysis читает их через context"""
+    parts, stats = compress_parts(
+        [task.output.raw for task in tasks],
+        f"{task_analysis.description}\n{task_analysis.expected_output}",
+        budget,
+    )
+    for task, text in zip(tasks, parts):
+        task.output.raw = text
+    print(f"🗜️ Context для анализа: {format_stats(stats)}")
+    return stats
+
 if __name__ == "__main__":
     print(f"🚀 ПЕРЕЗАПУСК (GEMINI VERSION) ДЛЯ: {TARGET_SITE}")
+    crew_scouting.kickoff()
+    compress_scouting_outputs()
     crew.kickoff()
     print(f"\n✅ ГОТОВО! Проверяй папку: {OUTPUT_DIR}")
\ No newline at end of file
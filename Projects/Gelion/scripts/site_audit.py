@@ -1,32 +1,24 @@
 import os
-import requests
-from bs4 import BeautifulSoup
 import time
 from urllib.parse import urljoin, urlparse
 import re
+import asyncio
+import argparse
 
-# Настройка прокси
-# ВНИМАНИЕ: Учетные данные прокси были удалены для безопасности
-# proxies = {
-#     'http': 'http://<username>:<password>@<proxy_host>:<proxy_port>',
-#     'https': 'http://<username>:<password>@<proxy_host>:<proxy_port>'
-# }
+from http_fetch import HEADERS as headers
+from audit_report import OUTPUT_DIR, RecordWriter, output_path, render_markdown
+from audit_store import AuditStore, conditional_headers, content_hash, diff_analysis
+from html_scan import charset_from_content_type, scan_html, seo_from_scan, technical_from_scan
+from image_probe import probe_images
+from link_checker import check_urls, extract_links, is_working, normalize_url
+from page_timing import PHASE_NAMES, PHASES, sample_timings, timed_fetch
 
-# Заголовки для имитации реального браузера
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+DEFAULT_URL = "https://www.aerodrom-gelion.ru/"
 
-def check_page_load_time(url):
-    """Проверка времени загрузки страницы"""
-    try:
-        start_time = time.time()
-        # Прокси-настройки удалены для безопасности
-        response = requests.get(url, headers=headers)
-        load_time = time.time() - start_time
-        return load_time, response.status_code
-    except Exception as e:
-        return None, str(e)
+
+def format_timings(timings):
+    """Фазы загрузки в миллисекундах для вывода"""
+    return [f"{PHASE_NAMES[phase]}: {timings[phase] * 1000:.0f} мс" for phase in PHASES if phase == 'total' or timings[phase]]
 
 def analyze_seo_elements(soup):
     """Анализ SEO элементов"""
@@ -78,42 +70,50 @@ def analyze_seo_elements(soup):
 
 def check_images_optimization(soup, base_url):
     """Проверка оптимизации изображений"""
-    images = soup.find_all('img')
-    img_report = {'total': len(images), 'optimized': 0, 'unoptimized': 0, 'missing_alt': 0}
+    images = [(img.get('src', ''), img.get('alt', '')) for img in soup.find_all('img')]
+    return images_report(images, base_url)
+
+def images_report(images, base_url):
+    """Отчет по изображениям из списка пар (src, alt)"""
+    img_report = {'total': len(images), 'optimized': 0, 'unoptimized': 0, 'missing_alt': 0, 'details': {}}
     
-    for img in images:
-        alt_attr = img.get('alt', '')
+    image_urls = []
+    for src, alt_attr in images:
         if not alt_attr:
             img_report['missing_alt'] += 1
         
-        # Проверяем, есть ли атрибуты размеров или src
-        src = img.get('src', '')
         if src:
-            full_url = urljoin(base_url, src)
+            # URL, который не разбирается (например, нечисловой порт), проверяется как есть:
+            # probe_images запишет ошибку на это изображение, и оно будет неоптимизированным
             try:
-                # Проверяем размер изображения
-                img_response = requests.head(full_url, headers=headers)
-                content_length = img_response.headers.get('content-length')
-                if content_length:
-                    size_kb = int(content_length) / 1024
-                    if size_kb < 200:  # Условие для "оптимизированного" изображения
-                        img_report['optimized'] += 1
-                    else:
-                        img_report['unoptimized'] += 1
-                else:
-                    img_report['unoptimized'] += 1
-            except:
-                img_report['unoptimized'] += 1
+                image_urls.append(normalize_url(urljoin(base_url, src)))
+            except ValueError:
+                image_urls.append(src)
+    
+    # Вес изображений определяем параллельно, неизмененные берем из кэша
+    results = asyncio.run(probe_images(image_urls))
     
+    for full_url in image_urls:
+        size = results[full_url].get('size')
+        if size is not None and size / 1024 < 200:  # Условие для "оптимизированного" изображения
+            img_report['optimized'] += 1
+        else:
+            img_report['unoptimized'] += 1
+    
+    img_report['details'] = results
     return img_report
 
 def check_links_status(soup, base_url):
     """Проверка статуса ссылок"""
-    links = soup.find_all('a', href=True)
-    link_report = {'total': len(links), 'working': 0, 'broken': 0, 'external': 0}
+    hrefs = [link.get('href', '') for link in soup.find_all('a', href=True)]
+    return links_report(hrefs, base_url)
+
+def links_report(hrefs, base_url):
+    """Отчет по ссылкам из списка href"""
+    link_report = {'total': len(hrefs), 'working': 0, 'broken': 0, 'external': 0, 'details': {}}
     
-    for link in links:
-        href = link.get('href', '')
+    internal_urls = []
+    for href in hrefs:
         full_url = urljoin(base_url, href)
         
         # Определяем, внутренняя или внешняя ссылка
@@ -121,15 +121,18 @@ def check_links_status(soup, base_url):
             link_report['external'] += 1
             continue
         
-        try:
-            link_response = requests.head(full_url, headers=headers)
-            if link_response.status_code < 400:
-                link_report['working'] += 1
-            else:
-                link_report['broken'] += 1
-        except:
+        internal_urls.append(normalize_url(full_url))
+    
+    # Каждый уникальный URL проверяется один раз, параллельно
+    results = asyncio.run(check_urls(internal_urls))
+    
+    for full_url in internal_urls:
+        if is_working(results[full_url]):
+            link_report['working'] += 1
+        else:
             link_report['broken'] += 1
     
+    link_report['details'] = results
     return link_report
 
 def check_technical_aspects(soup):
@@ -158,32 +161,178 @@ def check_technical_aspects(soup):
     
     return tech_report
 
-def main():
-    url = "https://www.aerodrom-gelion.ru/"
+def find_issues(seo_report, tech_report, img_report, load_time):
+    """Список найденных проблем по результатам анализа"""
+    issues = []
+    
+    # SEO проблемы
+    if seo_report['title']['length'] < 10 or seo_report['title']['length'] > 60:
+        issues.append(f"Заголовок страницы не оптимален по длине (рекомендуется 10-60 символов): {seo_report['title']['length']}")
+    
+    if seo_report['description']['length'] < 50 or seo_report['description']['length'] > 160:
+        issues.append(f"Мета-описание не оптималено по длине (рекомендуется 50-160 символов): {seo_report['description']['length']}")
+    
+    if seo_report['headings']['h1_count'] != 1:
+        issues.append(f"Количество H1 заголовков не оптимально (рекомендуется 1): {seo_report['headings']['h1_count']}")
     
-    print("Начинаем полный анализ сайта aerodrom-gelion.ru...")
+    # Технические проблемы
+    if not tech_report['viewport']:
+        issues.append("Отсутствует мета-тег viewport (важен для адаптивности)")
+    
+    if tech_report['html_lang'] == 'Не указан':
+        issues.append("Не указан язык HTML (lang атрибут)")
+    
+    if img_report['missing_alt'] > 0:
+        issues.append(f"Найдено {img_report['missing_alt']} изображений без alt-атрибута")
+    
+    if load_time and load_time > 3:
+        issues.append(f"Время загрузки страницы слишком медленное: {load_time:.2f} секунд (рекомендуется < 3 секунды)")
+    
+    return issues
+
+def find_recommendations(seo_report, tech_report, img_report, load_time):
+    """Рекомендации по улучшению по результатам анализа"""
+    recommendations = []
+    
+    if load_time and load_time > 3:
+        recommendations.append("Оптимизировать время загрузки страницы: сжать изображения, использовать кэширование, минимизировать CSS/JS")
+    
+    if tech_report['html_lang'] == 'Не указан':
+        recommendations.append("Добавить атрибут lang к HTML тегу (например, <html lang='ru'>)")
+    
+    if not tech_report['viewport']:
+        recommendations.append("Добавить мета-тег viewport для адаптивности: <meta name='viewport' content='width=device-width, initial-scale=1'>")
+    
+    if img_report['missing_alt'] > 0:
+        recommendations.append("Добавить alt-атрибуты ко всем изображениям для улучшения SEO и доступности")
+    
+    if seo_report['headings']['h1_count'] != 1:
+        recommendations.append("Убедиться, что на странице есть только один H1 заголовок, описывающий основную тему страницы")
+    
+    return recommendations
+
+def audit_page(scan, url):
+    """Запуск всех анализаторов для одной страницы (по результату scan_html)"""
+    return {
+        'seo': seo_from_scan(scan),
+        'technical': technical_from_scan(scan),
+        'images': images_report(scan.images, url),
+        'links': links_report(scan.anchors, url),
+    }
+
+def run_crawl(url, max_pages, max_depth, respect_robots=True, incremental=False):
+    """Обход всего сайта с построчной записью результатов в JSONL"""
+    from site_crawler import crawl
+    
+    host = urlparse(url).netloc
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+    records_path = output_path(f"crawl_{host.replace(':', '_')}_{timestamp}.jsonl")
+    store = AuditStore() if incremental else None
+    
+    print(f"Начинаем обход сайта {host} (страниц: до {max_pages}, глубина: до {max_depth})...")
+    try:
+        stats = asyncio.run(crawl(url, records_path, max_pages=max_pages, max_depth=max_depth, respect_robots=respect_robots, store=store))
+    finally:
+        if store:
+            store.close()
+    print(f"\n   Обработано страниц: {stats['pages']}, ошибок: {stats['errors']}, запрещено robots.txt: {stats['skipped_robots']}")
+    if incremental:
+        print(f"   Без изменений с прошлого аудита: {stats['unchanged']}")
+    print(f"   Время обхода: {stats['elapsed']} секунд")
+    report_path = render_markdown(records_path, records_path[:-len('.jsonl')] + '.md')
+    print(f"   Результаты сохранены в файл: {records_path}")
+    print(f"   Отчет сохранен в файл: {report_path}")
+
+def main(url=DEFAULT_URL, samples=1, incremental=False):
+    host = urlparse(url).netloc
+    print(f"Начинаем полный анализ сайта {host}...")
+    
+    # Результаты каждого этапа сразу пишутся в JSONL, Markdown собирается из них в конце
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+    records_path = output_path(f"audit_{host.replace(':', '_')}_{timestamp}.jsonl")
+    report_path = output_path('ANALYSIS_REPORT.md')
+    writer = RecordWriter(records_path)
+    writer.emit('meta', {'url': url, 'host': host})
+    store = None
     
     try:
-        # Получаем содержимое сайта
-        response = requests.get(url, headers=headers, timeout=15)
-        if response.status_code != 200:
+        # Инкрементальный режим: условный запрос по ETag/Last-Modified прошлого аудита
+        store = AuditStore() if incremental else None
+        store_key = normalize_url(url)
+        previous = store.get(store_key) if store else None
+        # Прошлый анализ переиспользуется, только если в записи есть ссылки страницы - ими пользуется обход (--crawl)
+        reusable = bool(previous and previous['analysis'] and previous['links'])
+        request_headers = headers
+        if reusable and samples == 1:
+            request_headers = {**headers, **conditional_headers(previous)}
+        
+        # Получаем содержимое сайта одним запросом с замером фаз загрузки
+        timing_summary = None
+        if samples > 1:
+            timing_summary, response = sample_timings(url, samples, request_headers)
+        else:
+            response = timed_fetch(url, request_headers)
+        
+        digest = content_hash(response.content) if response.status_code == 200 else None
+        not_modified = reusable and (
+            response.status_code == 304 or digest == previous['content_hash']
+        )
+        if response.status_code != 200 and not not_modified:
             print(f"Ошибка при получении сайта: {response.status_code}")
+            writer.emit('error', {'error': f"Ошибка при получении сайта: {response.status_code}"})
             return
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        if not_modified:
+            # Страница не изменилась - разбор и проверки не нужны
+            print("\n   Страница не изменилась с прошлого аудита, используем сохраненный анализ")
+            analysis = dict(previous['analysis'])
+            page_links = previous['links']
+        else:
+            # Один проход по HTML вместо многократного обхода дерева BeautifulSoup
+            scan = scan_html(response.content, charset_from_content_type(response.headers.get('content-type')))
+            analysis = {}
+            page_links = extract_links(scan.anchors, response.url, urlparse(response.url).netloc)
+        
+        analyzers = {
+            'seo': lambda: seo_from_scan(scan),
+            'images': lambda: images_report(scan.images, url),
+            'links': lambda: links_report(scan.anchors, url),
+            'technical': lambda: technical_from_scan(scan),
+        }
+        
+        def run_phase(name):
+            """Выполнение этапа (или результат из прошлого аудита) и запись его в JSONL"""
+            if name not in analysis:
+                analysis[name] = analyzers[name]()
+            writer.emit(name, analysis[name])
+            return analysis[name]
         
         # Анализ времени загрузки
         print("\n1. Анализ времени загрузки...")
-        load_time, status = check_page_load_time(url)
-        if load_time:
-            print(f"   Время загрузки: {load_time:.2f} секунд")
-            print(f"   Статус: {status}")
-        else:
-            print(f"   Ошибка при измерении времени загрузки: {status}")
+        timings = response.timings
+        load_time = timings['total']
+        print(f"   Время загрузки: {load_time:.2f} секунд")
+        print(f"   Статус: {response.status_code}")
+        print(f"   Фазы: {', '.join(format_timings(timings))}")
+        if timing_summary:
+            print(f"   Замеров: {samples}")
+            for phase in PHASES:
+                values = timing_summary[phase]
+                print(f"   {PHASE_NAMES[phase]}: p50 {values['p50'] * 1000:.0f} мс, p90 {values['p90'] * 1000:.0f} мс, p99 {values['p99'] * 1000:.0f} мс")
+            speed = timing_summary['bytes_per_sec']
+            print(f"   Скорость: p50 {speed['p50'] / 1024:.0f} КБ/с, p90 {speed['p90'] / 1024:.0f} КБ/с")
+        writer.emit('timing', {
+            'url': url,
+            'status': response.status_code,
+            'timings': timings,
+            'wire_bytes': response.wire_bytes,
+            'summary': timing_summary,
+            'not_modified': not_modified,
+        })
         
         # SEO анализ
         print("\n2. SEO анализ...")
-        seo_report = analyze_seo_elements(soup)
+        seo_report = run_phase('seo')
         print(f"   Заголовок: '{seo_report['title']['text']}' (длина: {seo_report['title']['length']} символов)")
         print(f"   Описание: '{seo_report['description']['content']}' (длина: {seo_report['description']['length']} символов)")
         print(f"   Ключевые слова: {seo_report['keywords']['content']}")
@@ -193,7 +342,7 @@ def main():
         
         # Анализ изображений
         print("\n3. Анализ изображений...")
-        img_report = check_images_optimization(soup, url)
+        img_report = run_phase('images')
         print(f"   Всего изображений: {img_report['total']}")
         print(f"   Изображений без alt-атрибута: {img_report['missing_alt']}")
         print(f"   Оптимизированных изображений: {img_report['optimized']}")
@@ -201,15 +350,18 @@ def main():
         
         # Анализ ссылок
         print("\n4. Анализ ссылок...")
-        link_report = check_links_status(soup, url)
+        link_report = run_phase('links')
         print(f"   Всего ссылок: {link_report['total']}")
         print(f"   Рабочих ссылок: {link_report['working']}")
         print(f"   Сломанных ссылок: {link_report['broken']}")
         print(f"   Внешних ссылок: {link_report['external']}")
+        for link_url, result in link_report['details'].items():
+            if not is_working(result):
+                print(f"   - {link_url}: {result['status'] or result['error']} ({result['latency']} с)")
         
         # Технический анализ
         print("\n5. Технический анализ...")
-        tech_report = check_technical_aspects(soup)
+        tech_report = run_phase('technical')
         print(f"   Наличие viewport: {tech_report['viewport']}")
         print(f"   Язык HTML: {tech_report['html_lang']}")
         print(f"   Наличие favicon: {tech_report['favicon']}")
@@ -218,30 +370,8 @@ def main():
         # Формирование общего отчета
         print("\n6. Общий отчет:")
         
-        issues = []
-        
-        # SEO проблемы
-        if seo_report['title']['length'] < 10 or seo_report['title']['length'] > 60:
-            issues.append(f"Заголовок страницы не оптимален по длине (рекомендуется 10-60 символов): {seo_report['title']['length']}")
-        
-        if seo_report['description']['length'] < 50 or seo_report['description']['length'] > 160:
-            issues.append(f"Мета-описание не оптималено по длине (рекомендуется 50-160 символов): {seo_report['description']['length']}")
-        
-        if seo_report['headings']['h1_count'] != 1:
-            issues.append(f"Количество H1 заголовков не оптимально (рекомендуется 1): {seo_report['headings']['h1_count']}")
-        
-        # Технические проблемы
-        if not tech_report['viewport']:
-            issues.append("Отсутствует мета-тег viewport (важен для адаптивности)")
-        
-        if tech_report['html_lang'] == 'Не указан':
-            issues.append("Не указан язык HTML (lang атрибут)")
-        
-        if img_report['missing_alt'] > 0:
-            issues.append(f"Найдено {img_report['missing_alt']} изображений без alt-атрибута")
-        
-        if load_time and load_time > 3:
-            issues.append(f"Время загрузки страницы слишком медленное: {load_time:.2f} секунд (рекомендуется < 3 секунды)")
+        issues = find_issues(seo_report, tech_report, img_report, load_time)
+        writer.emit('issues', issues)
         
         if issues:
             print("\n   Найденные проблемы:")
@@ -250,23 +380,8 @@ def main():
         else:
             print("\n   Проблем не найдено!")
         
-        # Рекомендации
-        recommendations = []
-        
-        if load_time and load_time > 3:
-            recommendations.append("Оптимизировать время загрузки страницы: сжать изображения, использовать кэширование, минимизировать CSS/JS")
-        
-        if tech_report['html_lang'] == 'Не указан':
-            recommendations.append("Добавить атрибут lang к HTML тегу (например, <html lang='ru'>)")
-        
-        if not tech_report['viewport']:
-            recommendations.append("Добавить мета-тег viewport для адаптивности: <meta name='viewport' content='width=device-width, initial-scale=1'>")
-        
-        if img_report['missing_alt'] > 0:
-            recommendations.append("Добавить alt-атрибуты ко всем изображениям для улучшения SEO и доступности")
-        
-        if seo_report['headings']['h1_count'] != 1:
-            recommendations.append("Убедиться, что на странице есть только один H1 заголовок, описывающий основную тему страницы")
+        recommendations = find_recommendations(seo_report, tech_report, img_report, load_time)
+        writer.emit('recommendations', recommendations)
         
         if recommendations:
             print("\n   Рекомендации по улучшению:")
@@ -275,65 +390,53 @@ def main():
         else:
             print("\n   Рекомендаций по улучшению нет!")
         
-        # Сохранение отчета в файл
-        report_content = f"""# Отчет по анализу сайта aerodrom-gelion.ru
-
-## Общая информация
-- URL: {url}
-- Статус: {response.status_code}
-- Время загрузки: {load_time:.2f} секунд
-
-## SEO Анализ
-- Заголовок: '{seo_report['title']['text']}' ({seo_report['title']['length']} символов)
-- Описание: '{seo_report['description']['content']}' ({seo_report['description']['length']} символов)
-- Ключевые слова: {seo_report['keywords']['content']}
-- Заголовки H1: {seo_report['headings']['h1_count']} шт. - {seo_report['headings']['h1_text']}
-- Заголовки H2: {seo_report['headings']['h2_count']} шт.
-- Заголовки H3: {seo_report['headings']['h3_count']} шт.
-
-## Анализ изображений
-- Всего изображений: {img_report['total']}
-- Изображений без alt-атрибута: {img_report['missing_alt']}
-- Оптимизированных изображений: {img_report['optimized']}
-- Неоптимизированных изображений: {img_report['unoptimized']}
-
-## Анализ ссылок
-- Всего ссылок: {link_report['total']}
-- Рабочих ссылок: {link_report['working']}
-- Сломанных ссылок: {link_report['broken']}
-- Внешних ссылок: {link_report['external']}
-
-## Технический анализ
-- Наличие viewport: {tech_report['viewport']}
-- Язык HTML: {tech_report['html_lang']}
-- Наличие favicon: {tech_report['favicon']}
-- Наличие структурированных данных: {tech_report['structured_data']}
-
-## Найденные проблемы
-"""
-        
-        if issues:
-            for i, issue in enumerate(issues, 1):
-                report_content += f"{i}. {issue}\n"
-        else:
-            report_content += "Проблем не найдено!\n"
-        
-        report_content += "\n## Рекомендации по улучшению\n"
-        
-        if recommendations:
-            for i, rec in enumerate(recommendations, 1):
-                report_content += f"{i}. {rec}\n"
-        else:
-            report_content += "Рекомендаций по улучшению нет!\n"
-        
-        # Записываем отчет в файл
-        with open('AI_Agency/Projects/Gelion Info/ANALYSIS_REPORT.md', 'w', encoding='utf-8') as f:
-            f.write(report_content)
-        
-        print(f"\n   Отчет сохранен в файл: AI_Agency/Projects/Gelion Info/ANALYSIS_REPORT.md")
+        if store:
+            changes = diff_analysis(previous['analysis'], analysis) if previous else []
+            store.put(
+                store_key,
+                response.headers.get('etag') or (previous or {}).get('etag'),
+                response.headers.get('last-modified') or (previous or {}).get('last_modified'),
+                digest or previous['content_hash'],
+                analysis,
+                page_links,
+            )
+            writer.emit('changes', {'previous_audit': previous['audited_at'] if previous else None, 'changes': changes})
+            
+            print(f"\n7. Изменения с прошлого аудита: {len(changes) if previous else 'первый аудит'}")
+            for key, old_value, new_value in changes:
+                print(f"   {key}: {old_value} -> {new_value}")
+        
+        writer.emit('done', {})
         
     except Exception as e:
         print(f"Произошла ошибка при анализе сайта: {str(e)}")
+        writer.emit('error', {'error': str(e)})
+    finally:
+        if store:
+            store.close()
+        writer.close()
+        
+        # Markdown собирается из записей, в том числе после сбоя - с готовыми этапами
+        render_markdown(records_path, report_path)
+        print(f"\n   Отчет сохранен в файл: {report_path}")
+        print(f"   Записи аудита (JSONL): {records_path}")
+        if incremental:
+            changes_path = output_path('ANALYSIS_CHANGES.md')
+            render_markdown(records_path, changes_path, types={'meta', 'changes', 'error'})
+            print(f"   Отчет об изменениях сохранен в файл: {changes_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Аудит сайта")
+    parser.add_argument("url", nargs="?", default=DEFAULT_URL, help="Адрес сайта")
+    parser.add_argument("--crawl", action="store_true", help="Обойти все страницы сайта")
+    parser.add_argument("--max-pages", type=int, default=200, help="Лимит страниц при обходе")
+    parser.add_argument("--max-depth", type=int, default=3, help="Лимит глубины при обходе")
+    parser.add_argument("--ignore-robots", action="store_true", help="Не учитывать robots.txt")
+    parser.add_argument("--incremental", action="store_true", help="Повторный аудит: пропускать неизмененные страницы и показать изменения")
+    parser.add_argument("--samples", type=int, default=1, help="Число замеров времени загрузки (p50/p90/p99)")
+    args = parser.parse_args()
+    
+    if args.crawl:
+        run_crawl(args.url, args.max_pages, args.max_depth, respect_robots=not args.ignore_robots, incremental=args.incremental)
+    else:
+        main(args.url, samples=args.samples, incremental=args.incremental)
@@ -1,5 +1,4 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 import time
 from urllib.parse import urljoin, urlparse
@@ -7,27 +6,18 @@ import re
 import sys
 import io
 
+from http_fetch import fetch, head
+
 # Устанавливаем кодировку для правильного вывода
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-# Настройка прокси
-# ВНИМАНИЕ: Учетные данные прокси были удалены для безопасности
-# proxies = {
-#     'http': 'http://<username>:<password>@<proxy_host>:<proxy_port>',
-#     'https': 'http://<username>:<password>@<proxy_host>:<proxy_port>'
-# }
-
-# Заголовки для имитации реального браузера
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+# Прокси берутся из окружения (HTTP_PROXY/HTTPS_PROXY), заголовки и пул соединений - в http_fetch
 
 def check_page_load_time(url):
     """Проверка времени загрузки страницы"""
     try:
         start_time = time.time()
-        # Прокси-настройки удалены для безопасности
-        response = requests.get(url, headers=headers)
+        response = fetch(url)
         load_time = time.time() - start_time
         return load_time, response.status_code
     except Exception as e:
@@ -100,8 +90,7 @@ def check_images_optimization(soup, base_url):
             full_url = urljoin(base_url, src)
             try:
                 # Проверяем размер изображения
-                # Прокси-настройки удалены для безопасности
-                img_response = requests.head(full_url, headers=headers)
+                img_response = head(full_url)
                 content_length = img_response.headers.get('content-length')
                 if content_length:
                     size_kb = int(content_length) / 1024
@@ -131,8 +120,7 @@ def check_links_status(soup, base_url):
             continue
         
         try:
-            # Прокси-настройки удалены для безопасности
-            link_response = requests.head(full_url, headers=headers)
+            link_response = head(full_url)
             if link_response.status_code < 400:
                 link_report['working'] += 1
             else:
@@ -175,8 +163,7 @@ def main():
     
     try:
         # Получаем содержимое сайта
-        # Прокси-настройки удалены для безопасности
-        response = requests.get(url, headers=headers, timeout=15)
+        response = fetch(url)
         if response.status_code != 200:
             print(f"Ошибка при получении сайта: {response.status_code}")
             return
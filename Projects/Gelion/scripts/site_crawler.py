@@ -0,0 +1,147 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from audit_report import RecordWriter
+from audit_store import conditional_headers, content_hash, diff_analysis
+from html_scan import charset_from_content_type, scan_html
+from http_fetch import HEADERS, TIMEOUT, fetch, get_session
+from link_checker import extract_links, normalize_url
+from site_audit import audit_page
+
+# Ограничения обхода по умолчанию
+MAX_PAGES = 200
+MAX_DEPTH = 3
+WORKERS = 8                 # Одновременно скачиваемых и анализируемых страниц
+FRONTIER_SIZE = 1000        # Максимальная длина очереди URL
+
+def load_robots(session, start_url):
+    """Загрузка robots.txt сайта. При ошибке обход разрешен"""
+    robots_url = urljoin(start_url, '/robots.txt')
+    parser = RobotFileParser(robots_url)
+    try:
+        response = session.get(robots_url, timeout=TIMEOUT)
+    except requests.RequestException:
+        parser.parse([])
+        return parser
+    if response.status_code >= 400:
+        parser.parse([])
+    else:
+        parser.parse(response.text.splitlines())
+    return parser
+
+
+def _fetch(session, url, request_headers=None):
+    start = time.perf_counter()
+    response = fetch(url, session=session, headers=request_headers)
+    return response, time.perf_counter() - start
+
+
+def _process_page(content, encoding, url, host):
+    """Анализ страницы и сбор ссылок (выполняется в отдельном потоке)"""
+    scan = scan_html(content, encoding)
+    return audit_page(scan, url), extract_links(scan.anchors, url, host)
+
+
+async def crawl(start_url, output_path, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, workers=WORKERS, respect_robots=True, store=None):
+    """Обход сайта с анализом каждой страницы. Записи страниц пишутся в JSONL по мере готовности.
+    С store (AuditStore) неизмененные страницы не разбираются повторно, а в записи попадают изменения"""
+    start_url = normalize_url(start_url)
+    host = urlparse(start_url).netloc
+    session = get_session()
+    robots = load_robots(session, start_url) if respect_robots else None
+
+    # Загрузка и разбор страниц - в своем пуле на workers потоков: пул asyncio.to_thread по умолчанию
+    # (min(32, CPU + 4) потоков) общий с проверкой ссылок и изображений и меньше числа обработчиков
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawler')
+    frontier = asyncio.Queue(maxsize=FRONTIER_SIZE)
+    visited = {start_url}
+    stats = {'pages': 0, 'errors': 0, 'skipped_robots': 0, 'unchanged': 0, 'started': time.time()}
+
+    writer = RecordWriter(output_path)
+    writer.emit('crawl', {'url': start_url, 'host': host, 'max_pages': max_pages, 'max_depth': max_depth})
+
+    if robots and not robots.can_fetch(HEADERS['User-Agent'], start_url):
+        print(f"   robots.txt запрещает обход {start_url}")
+        stats['skipped_robots'] += 1
+    else:
+        await frontier.put((start_url, 0))
+
+    def enqueue(url, depth):
+        if url in visited or len(visited) >= max_pages or depth > max_depth:
+            return
+        if robots and not robots.can_fetch(HEADERS['User-Agent'], url):
+            stats['skipped_robots'] += 1
+            return
+        if frontier.full():
+            return
+        visited.add(url)
+        frontier.put_nowait((url, depth))
+
+    async def worker():
+        nonlocal host, robots
+        while True:
+            url, depth = await frontier.get()
+            record = {'url': url, 'depth': depth}
+            try:
+                previous = store.get(url) if store else None
+                if not (previous and previous['analysis']):
+                    previous = None
+                # Запись без ссылок (например, от одностраничного аудита) не подменяет разбор страницы:
+                # иначе обход остановится на ней
+                reusable = previous if previous and previous['links'] else None
+                response, load_time = await loop.run_in_executor(pool, _fetch, session, url, conditional_headers(reusable))
+                record['status'] = response.status_code
+                record['load_time'] = round(load_time, 3)
+                final_host = urlparse(response.url).netloc
+                if depth == 0 and final_host != host:
+                    # Стартовая страница перенаправила на другой хост (домен -> www): внутренние ссылки - по нему.
+                    # Других страниц в очереди еще нет, так что смена хоста и robots.txt безопасна
+                    host = final_host
+                    visited.add(normalize_url(response.url))
+                    if robots:
+                        robots = await loop.run_in_executor(pool, load_robots, session, response.url)
+                content_type = response.headers.get('content-type', '')
+                digest = content_hash(response.content) if response.status_code == 200 else None
+                if reusable and (response.status_code == 304 or digest == reusable['content_hash']):
+                    # Страница не изменилась - берем прошлый анализ и ссылки
+                    record.update(reusable['analysis'])
+                    record['unchanged'] = True
+                    links = reusable['links']
+                    stats['unchanged'] += 1
+                elif response.status_code == 200 and 'html' in content_type:
+                    report, links = await loop.run_in_executor(pool, _process_page, response.content, charset_from_content_type(content_type), response.url, host)
+                    record.update(report)
+                    if store:
+                        record['changes'] = diff_analysis(previous['analysis'], report) if previous else None
+                        store.put(url, response.headers.get('etag'), response.headers.get('last-modified'), digest, report, links)
+                else:
+                    links = []
+                for link in links:
+                    enqueue(link, depth + 1)
+                stats['pages'] += 1
+            except Exception as e:
+                record['error'] = str(e)
+                stats['errors'] += 1
+            writer.emit('page', record)
+            print(f"   [{stats['pages'] + stats['errors']}/{len(visited)}] {record.get('status', 'ERR')} {url}")
+            frontier.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await frontier.join()
+        stats['elapsed'] = round(time.time() - stats.pop('started'), 2)
+        writer.emit('done', stats)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+
+    return stats
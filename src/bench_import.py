@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# Время импорта лаунчера (python -X importtime) на путях, которые должны оставаться быстрыми.
+# --list и --validate не должны загружать crewai вовсе
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+# Модули, которых не должно быть в --list / --validate
+FORBIDDEN_MODULES = ("crewai", "crewai_tools", "litellm")
+SCENARIOS = {
+    "list": ["main.py", "--list"],
+    "validate": ["main.py", "--validate"],
+}
+
+def import_times(args: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """(модуль -> собственное время, модуль верхнего уровня -> суммарное время), в микросекундах"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=BASE_DIR, capture_output=True, text=True, encoding="utf-8",
+    )
+    if proc.returncode not in (0, 1):
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    own, top_level = {}, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit(): continue   # строка заголовка
+        module = name.strip()
+        own[module] = int(self_us)
+        if not name[1:].startswith(" "):             # без отступа - импорт верхнего уровня
+            top_level[module] = int(cumulative_us)
+    return own, top_level
+
+def measure(args: List[str], repeat: int) -> Dict[str, object]:
+    runs = [import_times(args) for _ in range(repeat)]
+    totals = [sum(top.values()) for _, top in runs]
+    own, top_level = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    forbidden = sorted({m for m in own if m.split(".")[0] in FORBIDDEN_MODULES})
+    heaviest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "total_ms": round(statistics.median(totals) / 1000, 1),
+        "modules": len(own),
+        "forbidden": forbidden,
+        "heaviest": [(module, round(us / 1000, 1)) for module, us in heaviest],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Launcher import time benchmark (-X importtime)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario (median is reported)")
+    parser.add_argument("--max-ms", type=float, help="Fail if any scenario imports for longer than this")
+    parser.add_argument("--save", help="Save results as JSON baseline")
+    parser.add_argument("--compare", help="Compare with a saved JSON baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    for name, scenario in SCENARIOS.items():
+        result = results[name] = measure(scenario, args.repeat)
+        line = f"{name:<10} {result['total_ms']:>8.1f} ms  {result['modules']:>5} modules"
+        if name in baseline:
+            line += f"  ({(result['total_ms'] / baseline[name]['total_ms'] - 1) * 100:+.0f}% vs baseline)"
+        print(line)
+        for module, ms in result["heaviest"][:5]:
+            print(f"    {module:<40} {ms:>8.1f} ms")
+        if result["forbidden"]:
+            failed = True
+            print(f"    ❌ heavy modules imported: {', '.join(result['forbidden'][:10])}")
+        if args.max_ms and result["total_ms"] > args.max_ms:
+            failed = True
+            print(f"    ❌ over budget: {result['total_ms']} ms > {args.max_ms} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Saved to {args.save}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# Локальный поиск по базе знаний (Agency_Brain/tech, Agency_Brain/marketing, Projects/*/data):
+# BM25 по фрагментам Markdown, индекс на диске читается через mmap, без сети
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+AGENCY_ROOT = Path(__file__).resolve().parent.parent
+SOURCE_GLOBS = ("Agency_Brain/tech/**/*.md", "Agency_Brain/marketing/**/*.md", "Projects/*/data/**/*.md")
+INDEX_DIR = Path(__file__).resolve().parent / ".cache" / "brain_index"
+INDEX_VERSION = 1
+SNIPPET_WORDS = 120         # Абзацы одного раздела объединяются во фрагменты до этого размера
+STEM_CHARS = 6              # Грубый стемминг: слово обрезается до префикса (склонения в русском)
+REFRESH_SECONDS = 5.0       # Как часто get_brain_index проверяет, не изменились ли файлы
+LOAD_ATTEMPTS = 3           # Попыток открыть индекс, пока другой процесс его пересобирает
+BM25_K1, BM25_B = 1.2, 0.75
+POSTING = struct.Struct("<IH")  # (номер фрагмента, частота термина во фрагменте)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
+
+
+def tokenize(text: str) -> List[str]:
+    return [w[:STEM_CHARS] for w in _WORD_RE.findall(text.lower()) if len(w) > 1]
+
+
+def split_markdown(text: str) -> List[Tuple[str, str]]:
+    """[(заголовок раздела, текст фрагмента)]: разделы по заголовкам, внутри - абзацы до SNIPPET_WORDS слов"""
+    snippets: List[Tuple[str, str]] = []
+    heading, paragraphs, words = "", [], 0
+
+    def flush():
+        nonlocal paragraphs, words
+        if paragraphs: snippets.append((heading, "\n\n".join(paragraphs)))
+        paragraphs, words = [], 0
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block: continue
+        match = _HEADING_RE.match(block)
+        if match:
+            flush()
+            heading = match.group(2).strip()
+            block = block[match.end():].strip()
+            if not block: continue
+        size = len(block.split())
+        if paragraphs and words + size > SNIPPET_WORDS: flush()
+        paragraphs.append(block)
+        words += size
+    flush()
+    return snippets
+
+
+def source_files(root: Path = AGENCY_ROOT) -> Dict[str, Path]:
+    files = {}
+    for pattern in SOURCE_GLOBS:
+        for path in root.glob(pattern):
+            if path.is_file(): files[path.relative_to(root).as_posix()] = path
+    return dict(sorted(files.items()))
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BrainIndex:
+    """Обратный индекс: словарь терминов в meta.json, списки вхождений и тексты фрагментов -
+    в бинарных файлах, открытых через mmap. При изменении файлов заново разбираются только они,
+    разбор остальных берется из files.json"""
+
+    def __init__(self, root: Path = AGENCY_ROOT, index_dir: Path = INDEX_DIR):
+        self.root = root
+        self.index_dir = index_dir
+        self.meta: Dict[str, Any] = {}
+        self._maps: List[Tuple[Any, mmap.mmap]] = []
+        self._postings: Any = b""
+        self._texts: Any = b""
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- построение ---
+
+    def _stats(self, files: Dict[str, Path]) -> Dict[str, List[int]]:
+        return {name: [path.stat().st_mtime_ns, path.stat().st_size] for name, path in files.items()}
+
+    def is_stale(self) -> bool:
+        return not self.meta or self.meta.get("files") != self._stats(source_files(self.root))
+
+    def update(self) -> Dict[str, int]:
+        """Пересборка индекса после изменения файлов. Возвращает число разобранных и удаленных файлов"""
+        files = source_files(self.root)
+        stats = self._stats(files)
+        parsed_path = self.index_dir / "files.json"
+        try:
+            parsed = json.loads(parsed_path.read_text(encoding="utf-8"))
+            if parsed.get("version") != INDEX_VERSION: parsed = {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            parsed = {}
+        parsed_files = parsed.get("files", {})
+
+        changed = 0
+        for name, path in files.items():
+            entry = parsed_files.get(name)
+            if entry and entry["stat"] == stats[name]: continue
+            text = path.read_text(encoding="utf-8", errors="replace")
+            parsed_files[name] = {
+                "stat": stats[name],
+                "snippets": [{"heading": heading, "text": body, "terms": dict(Counter(tokenize(f"{heading} {body}")))}
+                             for heading, body in split_markdown(text)],
+            }
+            changed += 1
+        removed = [name for name in parsed_files if name not in files]
+        for name in removed: del parsed_files[name]
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(parsed_path, json.dumps({"version": INDEX_VERSION, "files": parsed_files}, ensure_ascii=False).encode("utf-8"))
+        self._write_index(parsed_files, stats)
+        return {"parsed": changed, "removed": len(removed), "files": len(files)}
+
+    def _write_index(self, parsed_files: Dict[str, Any], stats: Dict[str, List[int]]):
+        snippets, postings_by_term = [], {}
+        texts = bytearray()
+        total_length = 0
+        for name in sorted(parsed_files):
+            for snippet in parsed_files[name]["snippets"]:
+                snippet_id = len(snippets)
+                data = snippet["text"].encode("utf-8")
+                length = sum(snippet["terms"].values())
+                snippets.append([name, snippet["heading"], len(texts), len(data), length])
+                texts += data
+                total_length += length
+                for term, tf in snippet["terms"].items():
+                    postings_by_term.setdefault(term, []).append((snippet_id, min(tf, 0xFFFF)))
+
+        postings = bytearray()
+        vocab = {}
+        for term in sorted(postings_by_term):
+            entries = postings_by_term[term]
+            vocab[term] = [len(postings) // POSTING.size, len(entries)]
+            for entry in entries: postings += POSTING.pack(*entry)
+
+        # Новое поколение файлов рядом со старым: открытые mmap старого поколения остаются рабочими
+        generation = int(time.time() * 1000)
+        _write_atomic(self.index_dir / f"postings.{generation}.bin", bytes(postings))
+        _write_atomic(self.index_dir / f"texts.{generation}.bin", bytes(texts))
+        meta = {
+            "version": INDEX_VERSION,
+            "generation": generation,
+            "files": stats,
+            "snippets": snippets,
+            "avg_length": total_length / len(snippets) if snippets else 0.0,
+            "vocab": vocab,
+        }
+        _write_atomic(self.index_dir / "meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        for old in self.index_dir.glob("*.bin"):
+            if not old.name.endswith(f".{generation}.bin"):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass    # Windows: файл еще открыт другим процессом, удалится при следующей пересборке
+
+    # --- чтение ---
+
+    def open(self, refresh: bool = True) -> "BrainIndex":
+        """Загрузка индекса с диска; с refresh - предварительное обновление, если файлы изменились"""
+        with self._lock:
+            self._load()
+            if refresh and self.is_stale():
+                self.update()
+                self._load()
+            self._checked_at = time.monotonic()
+        return self
+
+    def refresh_if_stale(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < REFRESH_SECONDS: return
+            self._checked_at = time.monotonic()
+            if self.is_stale():
+                self.update()
+                self._load()
+
+    def _load(self):
+        # Другой процесс может пересобрать индекс и удалить файлы поколения между чтением meta.json и mmap -
+        # тогда meta.json читается заново. Не получилось - индекс считается устаревшим и пересобирается
+        for _ in range(LOAD_ATTEMPTS):
+            try:
+                meta = json.loads((self.index_dir / "meta.json").read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.meta = {}
+                return
+            if meta.get("version") != INDEX_VERSION:
+                self.meta = {}
+                return
+            generation = meta["generation"]
+            maps: List[Tuple[Any, mmap.mmap]] = []
+            try:
+                postings = self._map(self.index_dir / f"postings.{generation}.bin", maps)
+                texts = self._map(self.index_dir / f"texts.{generation}.bin", maps)
+            except FileNotFoundError:
+                for f, mapped in maps:
+                    mapped.close()
+                    f.close()
+                continue
+            self._close_maps()
+            self._maps, self._postings, self._texts, self.meta = maps, postings, texts, meta
+            return
+        self.meta = {}
+
+    def _map(self, path: Path, maps: List[Tuple[Any, mmap.mmap]]) -> Any:
+        f = open(path, "rb")
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return b""
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        maps.append((f, mapped))
+        return mapped
+
+    def _close_maps(self):
+        for f, mapped in self._maps:
+            mapped.close()
+            f.close()
+        self._maps = []
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
+            self.meta = {}
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k фрагментов по BM25: [{path, heading, text, score}]"""
+        # Весь поиск под блокировкой: перезагрузка индекса в другом потоке закрывает mmap текущего поколения
+        with self._lock:
+            return self._search(query, top_k)
+
+    def _search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        meta, postings, texts = self.meta, self._postings, self._texts
+        if not meta or not meta["snippets"]: return []
+        snippets, vocab = meta["snippets"], meta["vocab"]
+        total, avg_length = len(snippets), meta["avg_length"] or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entry = vocab.get(term)
+            if not entry: continue
+            start, count = entry
+            idf = math.log(1 + (total - count + 0.5) / (count + 0.5))
+            chunk = postings[start * POSTING.size:(start + count) * POSTING.size]
+            for snippet_id, tf in POSTING.iter_unpack(chunk):
+                length = snippets[snippet_id][4]
+                scores[snippet_id] = scores.get(snippet_id, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                    tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        results = []
+        for snippet_id, score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1]):
+            path, heading, offset, size, _ = snippets[snippet_id]
+            text = bytes(texts[offset:offset + size]).decode("utf-8")
+            results.append({"path": path, "heading": heading, "text": text, "score": round(score, 3)})
+        return results
+
+
+def format_snippets(results: List[Dict[str, Any]]) -> str:
+    """Фрагменты для промпта: источник, раздел и текст"""
+    blocks = []
+    for result in results:
+        title = f"{result['path']} › {result['heading']}" if result["heading"] else result["path"]
+        blocks.append(f"[{title}]\n{result['text']}")
+    return "\n\n".join(blocks)
+
+
+_index: Optional[BrainIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_brain_index() -> BrainIndex:
+    """Общий индекс процесса; изменения файлов подхватываются не чаще раза в REFRESH_SECONDS"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BrainIndex().open()
+            return _index
+    _index.refresh_if_stale()
+    return _index
+
+
+def search_brain(query: str, top_k: int = 3) -> str:
+    """Top-k фрагментов базы знаний одним текстом - для backstory или ответа инструмента"""
+    return format_snippets(get_brain_index().search(query, top_k))
+
+
+def brain_search_tool(top_k: int = 3) -> Any:
+    """Инструмент агента "brain_search" (реестр инструментов в main.py). CrewAI импортируется только здесь"""
+    from crewai.tools import BaseTool
+
+    class BrainSearchTool(BaseTool):
+        name: str = "brain_search"
+        description: str = ("Search the agency knowledge base (Agency_Brain rules, marketing guides, project data) "
+                            "and return the most relevant Markdown snippets. Input: a short search query.")
+
+        def _run(self, query: str) -> str:
+            return search_brain(query, top_k) or "Nothing found in the knowledge base."
+
+    return BrainSearchTool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the local knowledge base index")
+    parser.add_argument("query", nargs="?", help="Search query")
+    parser.add_argument("-k", "--top-k", type=int, default=3)
+    parser.add_argument("--rebuild", action="store_true", help="Drop the index and build it from scratch")
+    args = parser.parse_args()
+
+    index = BrainIndex()
+    if args.rebuild:
+        for path in INDEX_DIR.glob("*"): path.unlink()
+    started = time.perf_counter()
+    index.open(refresh=False)
+    if index.is_stale():
+        print(f"Index updated: {index.update()}")
+        index.open(refresh=False)
+    print(f"Index ready: {len(index.meta['snippets'])} snippets, {len(index.meta['vocab'])} terms "
+          f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+    if not args.query: return
+
+    started = time.perf_counter()
+    results = index.search(args.query, args.top_k)
+    elapsed = (time.perf_counter() - started) * 1000
+    for result in results:
+        print(f"\n{result['score']:>7.3f}  {result['path']} › {result['heading']}")
+        print("    " + result["text"][:300].replace("\n", "\n    "))
+    print(f"\n{len(results)} results in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
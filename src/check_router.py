@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Проверка маршрутизатора провайдеров на локальных заглушках (stub_llm_server) - без сети и ключей.
+# Клиенты создаются тем же get_llm, что и у агентов, запросы идут через настоящий LLM CrewAI
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+import llm_router
+from stub_llm_server import StubBehavior, StubServer
+
+# Короткая пауза разомкнутой цепи, чтобы проверить восстановление за секунды
+llm_router.ROUTER_COOLDOWN = 1.0
+os.environ.setdefault("STUB_API_KEY", "stub")
+from main import get_llm
+
+TIMEOUT = 1.0
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def stub_llm(server: StubServer, name: str) -> dict:
+    return {"model": f"openai/{name}", "base_url": server.base_url, "api_key_env": "STUB_API_KEY",
+            "timeout": TIMEOUT, "max_retries": 0}
+
+
+def call_many(llm, count: int) -> List[str]:
+    return [llm.call(MESSAGES) for _ in range(count)]
+
+
+def scenario_failing_provider() -> List[str]:
+    """Основной провайдер отвечает 429: все запросы уходят на запасной, цепь размыкается"""
+    primary = StubServer(StubBehavior(fail_rate=1.0, fail_status=429)).start()
+    backup = StubServer(StubBehavior(reply="backup")).start()
+    try:
+        llm = get_llm(stub_llm(primary, "failing-primary"), [stub_llm(backup, "failing-backup")])
+        replies = call_many(llm, 5)
+        hits_when_open = primary.behavior.requests
+        replies += call_many(llm, 5)
+        health = llm_router.provider_health(llm_router.provider_name(llm))
+        problems = []
+        if replies != ["backup"] * 10: problems.append(f"unexpected replies: {replies}")
+        if health.state != llm_router.OPEN: problems.append(f"primary circuit is {health.state}, expected open")
+        if primary.behavior.requests != hits_when_open:
+            problems.append(f"open circuit still sent {primary.behavior.requests - hits_when_open} requests to primary")
+        return problems
+    finally:
+        primary.stop(); backup.stop()
+
+
+def scenario_slow_provider() -> List[str]:
+    """Основной провайдер не укладывается в таймаут: ответ приходит от запасного"""
+    primary = StubServer(StubBehavior(delay=TIMEOUT * 3)).start()
+    backup = StubServer(StubBehavior(reply="backup")).start()
+    try:
+        llm = get_llm(stub_llm(primary, "slow-primary"), [stub_llm(backup, "slow-backup")])
+        started = time.perf_counter()
+        replies = call_many(llm, 4)
+        elapsed = time.perf_counter() - started
+        problems = []
+        if replies != ["backup"] * 4: problems.append(f"unexpected replies: {replies}")
+        # После размыкания цепи запросы не ждут таймаут основного провайдера
+        budget = TIMEOUT * (llm_router.ROUTER_CONSECUTIVE_FAILURES + 1) + 2
+        if elapsed > budget: problems.append(f"took {elapsed:.1f}s, expected under {budget:.1f}s")
+        return problems
+    finally:
+        primary.stop(); backup.stop()
+
+
+def scenario_recovery() -> List[str]:
+    """Провайдер поднялся: после паузы пробный запрос замыкает цепь и трафик возвращается"""
+    primary = StubServer(StubBehavior(fail_rate=1.0, fail_status=503, reply="primary")).start()
+    backup = StubServer(StubBehavior(reply="backup")).start()
+    try:
+        llm = get_llm(stub_llm(primary, "recovering-primary"), [stub_llm(backup, "recovering-backup")])
+        call_many(llm, 4)
+        primary.behavior.fail_rate = 0.0
+        time.sleep(llm_router.ROUTER_COOLDOWN + 0.2)
+        replies = call_many(llm, 3)
+        health = llm_router.provider_health(llm_router.provider_name(llm))
+        problems = []
+        if replies != ["primary"] * 3: problems.append(f"unexpected replies after recovery: {replies}")
+        if health.state != llm_router.CLOSED: problems.append(f"primary circuit is {health.state}, expected closed")
+        return problems
+    finally:
+        primary.stop(); backup.stop()
+
+
+def scenario_all_down() -> List[str]:
+    """Все провайдеры падают: ошибка доходит до вызывающего кода, а не теряется"""
+    primary = StubServer(StubBehavior(fail_rate=1.0, fail_status=500)).start()
+    backup = StubServer(StubBehavior(fail_rate=1.0, fail_status=429)).start()
+    try:
+        llm = get_llm(stub_llm(primary, "down-primary"), [stub_llm(backup, "down-backup")])
+        errors = 0
+        for _ in range(6):
+            try:
+                llm.call(MESSAGES)
+            except Exception:
+                errors += 1
+        return [] if errors == 6 else [f"{6 - errors} calls succeeded with every provider down"]
+    finally:
+        primary.stop(); backup.stop()
+
+
+SCENARIOS: List[Tuple[str, Callable[[], List[str]]]] = [
+    ("failing provider", scenario_failing_provider),
+    ("slow provider", scenario_slow_provider),
+    ("recovery", scenario_recovery),
+    ("all providers down", scenario_all_down),
+]
+
+
+def main():
+    failed = False
+    for name, scenario in SCENARIOS:
+        try:
+            problems = scenario()
+        except Exception as e:
+            problems = [f"{type(e).__name__}: {e}"]
+        print(f"{'✅' if not problems else '❌'} {name}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed = failed or bool(problems)
+    for line in llm_router.health_summary(): print(line)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
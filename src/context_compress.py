@@ -0,0 +1,173 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from telemetry import CHARS_PER_TOKEN, estimate_tokens
+
+# Бюджет context задачи в токенах по умолчанию (0 - без сжатия). Задача может задать свой: context_budget
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 8000))
+CHUNK_TOKENS = 200              # Размер фрагмента, из которых выбираются самые релевантные
+BOILERPLATE_MAX_WORDS = 6       # Короткие строки, повторяющиеся в разных источниках - меню, футеры, cookie-баннеры
+GAP_MARK = "[...]"
+BM25_K1, BM25_B = 1.2, 0.75
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 2]
+
+
+def _normalize(line: str) -> str:
+    return " ".join(_WORD_RE.findall(line.lower()))
+
+
+def _dedupe(parts: List[str]) -> Tuple[List[List[str]], int]:
+    """Строки источников без повторов: каждая строка один раз на все источники,
+    короткие строки из нескольких источников (навигация, футеры) убираются совсем"""
+    lines = [[line.strip() for line in part.splitlines() if line.strip()] for part in parts]
+    sources_by_line: Dict[str, set] = {}
+    for i, part_lines in enumerate(lines):
+        for line in part_lines:
+            sources_by_line.setdefault(_normalize(line), set()).add(i)
+
+    seen = set()
+    removed = 0
+    result = []
+    for part_lines in lines:
+        kept = []
+        for line in part_lines:
+            key = _normalize(line)
+            boilerplate = len(key.split()) <= BOILERPLATE_MAX_WORDS and len(sources_by_line[key]) > 1
+            if not key or key in seen or boilerplate:
+                removed += 1
+                continue
+            seen.add(key)
+            kept.append(line)
+        result.append(kept)
+    return result, removed
+
+
+def _split_long(text: str) -> List[str]:
+    """Кусок длиннее CHUNK_TOKENS: по предложениям, затем по словам, затем по символам"""
+    if estimate_tokens(text) <= CHUNK_TOKENS: return [text]
+    max_chars = CHUNK_TOKENS * CHARS_PER_TOKEN
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    if len(sentences) > 1: return [piece for sentence in sentences for piece in _split_long(sentence)]
+    pieces, current = [], ""
+    for word in text.split():
+        for start in range(0, len(word), max_chars):
+            part = word[start:start + max_chars]
+            if current and len(current) + 1 + len(part) > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {part}" if current else part
+    if current: pieces.append(current)
+    return pieces
+
+
+def _truncate(text: str, budget_tokens: int) -> str:
+    """Начало текста в пределах budget_tokens, по границе слова, если она есть"""
+    max_chars = max(0, budget_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars: return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+def _chunk(lines: List[str]) -> List[str]:
+    """Соседние строки собираются во фрагменты до CHUNK_TOKENS, длинные строки режутся по предложениям,
+    а без знаков препинания - по словам или символам"""
+    chunks, current, size = [], [], 0
+    for line in lines:
+        for piece in _split_long(line):
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > CHUNK_TOKENS:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += tokens
+    if current: chunks.append("\n".join(current))
+    return chunks
+
+
+def _bm25_scores(chunks: List[str], query: str) -> List[float]:
+    query_terms = set(_terms(query))
+    docs = [Counter(_terms(chunk)) for chunk in chunks]
+    if not docs or not query_terms: return [0.0] * len(chunks)
+    avg_len = sum(sum(doc.values()) for doc in docs) / len(docs) or 1
+    df = Counter(term for doc in docs for term in query_terms if term in doc)
+    scores = []
+    for doc in docs:
+        length = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term)
+            if not tf: continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def compress_parts(parts: List[str], query: str, budget_tokens: int = CONTEXT_TOKEN_BUDGET) -> Tuple[List[str], Dict[str, Any]]:
+    """Сжатие результатов задач из context под бюджет токенов: без повторов и шаблонного текста,
+    только самые релевантные запросу (описанию задачи) фрагменты, в исходном порядке.
+    Каждый источник сохраняет хотя бы один фрагмент. Если context и так в бюджете - он не меняется"""
+    parts = [str(part) for part in parts]
+    tokens_in = sum(estimate_tokens(part) for part in parts)
+    stats = {"tokens_in": tokens_in, "tokens_out": tokens_in, "lines_removed": 0, "chunks": 0, "chunks_kept": 0}
+    if budget_tokens <= 0 or tokens_in <= budget_tokens:
+        return parts, stats
+
+    deduped, removed = _dedupe(parts)
+    chunks = [(i, position, chunk) for i, lines in enumerate(deduped) for position, chunk in enumerate(_chunk(lines))]
+    scores = _bm25_scores([chunk for _, _, chunk in chunks], query)
+    # Запас на перевод строки и метку пропуска рядом с фрагментом
+    costs = [estimate_tokens(chunk) + estimate_tokens(GAP_MARK) + 1 for _, _, chunk in chunks]
+
+    # Сначала лучший фрагмент каждого источника, затем остальные по убыванию релевантности.
+    # При равной оценке - фрагменты ближе к началу источника (заголовки, первые абзацы)
+    ranked = sorted(range(len(chunks)), key=lambda n: (-scores[n], chunks[n][1]))
+    best_per_source: Dict[int, int] = {}
+    for n in ranked:
+        best_per_source.setdefault(chunks[n][0], n)
+    selected, used = set(), 0
+    overhead = estimate_tokens(GAP_MARK) * 2 + 2
+    for source, n in best_per_source.items():
+        # Лучший фрагмент источника не выбрасывается: если не помещается целиком - обрезается под остаток бюджета,
+        # поделенный между источниками, которым еще ничего не досталось
+        if used + costs[n] > budget_tokens:
+            remaining = len(best_per_source) - len(selected)
+            share = (budget_tokens - used) // remaining - overhead
+            chunks[n] = (source, chunks[n][1], _truncate(chunks[n][2], max(1, share)))
+            costs[n] = estimate_tokens(chunks[n][2]) + overhead
+        selected.add(n)
+        used += costs[n]
+    for n in ranked:
+        if n in selected or used + costs[n] > budget_tokens: continue
+        selected.add(n)
+        used += costs[n]
+
+    result = []
+    for i in range(len(parts)):
+        pieces, previous = [], -1
+        for n, (source, position, chunk) in enumerate(chunks):
+            if source != i or n not in selected: continue
+            if position != previous + 1: pieces.append(GAP_MARK)
+            pieces.append(chunk)
+            previous = position
+        if previous != -1 and previous < sum(1 for s, _, _ in chunks if s == i) - 1: pieces.append(GAP_MARK)
+        result.append("\n".join(pieces))
+
+    stats.update(tokens_out=sum(estimate_tokens(part) for part in result), lines_removed=removed,
+                 chunks=len(chunks), chunks_kept=len(selected))
+    return result, stats
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    saved = stats["tokens_in"] - stats["tokens_out"]
+    return (f"{stats['tokens_in']} -> {stats['tokens_out']} tokens ({saved} saved), "
+            f"{stats['chunks_kept']}/{stats['chunks']} chunks kept, {stats['lines_removed']} duplicate lines removed")
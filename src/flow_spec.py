@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from scheduler import CycleError, topological_order
+
+# Скомпилированные flow: повторный запуск без разбора YAML и проверок, пока файлы не изменились
+CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "flows"
+SPEC_VERSION = 7
+SOURCE_FILES = ("agents.yaml", "tasks.yaml")
+
+# Поля agents.yaml / tasks.yaml: имя -> (допустимые типы, обязательное)
+AGENT_FIELDS = {
+    "role": ((str,), True),
+    "goal": ((str,), True),
+    "backstory": ((str,), False),       # Обязателен, если нет prompt
+    "prompt": ((str,), False),          # Файл промпта для backstory (реестр промптов main.py)
+    "llm": ((str, dict), False),
+    "llm_fallbacks": ((list,), False),
+    "tools": ((list,), False),
+    "verbose": ((bool,), False),
+    "name": ((str,), False),
+    "knowledge": ((int,), False),       # Сколько фрагментов базы знаний добавить в backstory
+}
+TASK_FIELDS = {
+    "description": ((str,), True),
+    "expected_output": ((str,), True),
+    "agent": ((str,), True),
+    "context": ((list,), False),
+    "async_execution": ((bool,), False),
+    "context_budget": ((int,), False),
+    "parallel": ((bool,), False),       # Не ждать предыдущую задачу - только задачи из context
+    "name": ((str,), False),
+}
+
+
+class FlowSpecError(ValueError):
+    """Ошибки в agents.yaml / tasks.yaml, найденные до создания агентов"""
+
+    def __init__(self, flow_name: str, problems: List[str]):
+        self.problems = problems
+        super().__init__(f"Flow '{flow_name}' is invalid:\n" + "\n".join(f"  - {p}" for p in problems))
+
+
+def load_yaml(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        raise FileNotFoundError(f"Config file not found: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def agent_items(agents_config: Any) -> List[Tuple[str, Dict[str, Any]]]:
+    """Агенты из agents.yaml (словарь или список) в виде [(ключ, конфиг)]"""
+    if isinstance(agents_config, list):
+        return [(item.get('role', f'a{i}') if isinstance(item, dict) else f'a{i}', item) for i, item in enumerate(agents_config)]
+    return list(agents_config.items())
+
+
+def task_items(tasks_config: Any) -> List[Tuple[str, Dict[str, Any]]]:
+    """Задачи из tasks.yaml (словарь или список) в виде [(ключ, конфиг)] в порядке файла"""
+    if isinstance(tasks_config, list):
+        return [(f"task_{i}", item) for i, item in enumerate(tasks_config)]
+    return list(tasks_config.items())
+
+
+def _check_fields(where: str, config: Any, fields: Dict[str, Tuple[tuple, bool]], problems: List[str], warnings: List[str]):
+    if not isinstance(config, dict):
+        problems.append(f"{where}: expected a mapping, got {type(config).__name__}")
+        return
+    for field, (types, required) in fields.items():
+        value = config.get(field)
+        if value is None:
+            if required: problems.append(f"{where}: missing '{field}'")
+        elif not isinstance(value, types):
+            problems.append(f"{where}: '{field}' must be {' or '.join(t.__name__ for t in types)}")
+    for field in config:
+        if field not in fields:
+            warnings.append(f"{where}: unknown field '{field}' is ignored")
+
+
+def compile_flow(flow_name: str, agents_config: Any, tasks_config: Any, known_tools: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Проверка схемы, ссылок на агентов, задачи и инструменты, поиск циклов в context.
+    Возвращает спецификацию flow, где все ссылки уже разрешены в ключи"""
+    problems: List[str] = []
+    warnings: List[str] = []
+    if not isinstance(agents_config, (dict, list)):
+        raise FlowSpecError(flow_name, ["agents.yaml: expected a mapping or a list of agents"])
+    if not isinstance(tasks_config, (dict, list)):
+        raise FlowSpecError(flow_name, ["tasks.yaml: expected a mapping or a list of tasks"])
+    known_tools = set(known_tools) if known_tools is not None else None
+
+    agents: Dict[str, Dict[str, Any]] = {}
+    agent_index: Dict[str, str] = {}
+    for key, config in agent_items(agents_config):
+        if not config: continue
+        where = f"agents.yaml: {key}"
+        _check_fields(where, config, AGENT_FIELDS, problems, warnings)
+        if not isinstance(config, dict): continue
+        if not config.get('backstory') and not config.get('prompt'):
+            problems.append(f"{where}: missing 'backstory' (or 'prompt' with a prompt file)")
+        llm = config.get('llm')
+        if isinstance(llm, dict) and not llm.get('model'):
+            problems.append(f"{where}: 'llm' mapping needs 'model'")
+        fallbacks = config.get('llm_fallbacks')
+        if isinstance(fallbacks, list):
+            if not llm:
+                problems.append(f"{where}: 'llm_fallbacks' without 'llm'")
+            for i, fallback in enumerate(fallbacks):
+                if not (isinstance(fallback, str) or isinstance(fallback, dict) and fallback.get('model')):
+                    problems.append(f"{where}: llm_fallbacks[{i}] must be a model name or a mapping with 'model'")
+        for tool in config.get('tools') or []:
+            if known_tools is not None and tool not in known_tools:
+                problems.append(f"{where}: unknown tool '{tool}'")
+        agents[key] = config
+        # Ссылка на агента - по ключу, имени или роли (первый агент с такой ролью)
+        agent_index[key] = key
+        if config.get('name'): agent_index[config['name']] = key
+    for key, config in agents.items():
+        if isinstance(config.get('role'), str): agent_index.setdefault(config['role'], key)
+
+    raw_tasks = task_items(tasks_config)
+    task_index: Dict[str, str] = {}
+    for key, config in raw_tasks:
+        task_index[key] = key
+        if isinstance(config, dict) and config.get('name'): task_index[config['name']] = key
+
+    tasks = []
+    graph: Dict[str, List[str]] = {}
+    # Порядок как у Process.sequential: задача ждет предыдущую синхронную задачу, а синхронная - еще и все
+    # асинхронные задачи после нее. context - только какие результаты передать (context: [] - никаких).
+    # parallel: true снимает неявный порядок: задача ждет только задачи из своего context
+    last_sync: Optional[str] = None
+    pending_async: List[str] = []
+    for key, config in raw_tasks:
+        where = f"tasks.yaml: {key}"
+        _check_fields(where, config, TASK_FIELDS, problems, warnings)
+        if not isinstance(config, dict): continue
+        agent_ref = config.get('agent')
+        agent_key = agent_index.get(agent_ref)
+        if agent_ref and not agent_key:
+            problems.append(f"{where}: agent '{agent_ref}' not found")
+        is_async = bool(config.get('async_execution'))
+        previous = ([last_sync] if last_sync else []) + ([] if is_async else pending_async)
+        if config.get('context') is not None:
+            context = []
+            for ref in config.get('context') or []:
+                if ref not in task_index:
+                    problems.append(f"{where}: context task '{ref}' not found")
+                else:
+                    context.append(task_index[ref])
+        else:
+            # Без context задача получает результат предыдущей, как в Process.sequential
+            context = [] if config.get('parallel') else previous
+        if is_async:
+            pending_async.append(key)
+        else:
+            last_sync, pending_async = key, []
+        graph[key] = context if config.get('parallel') else list(dict.fromkeys(previous + context))
+        tasks.append({"key": key, "config": config, "agent": agent_key, "context": context})
+
+    if not tasks:
+        problems.append("tasks.yaml: no tasks")
+    if problems:
+        raise FlowSpecError(flow_name, problems)
+    try:
+        order = topological_order(graph)
+    except CycleError as e:
+        raise FlowSpecError(flow_name, [str(e)])
+
+    return {
+        "version": SPEC_VERSION,
+        "flow": flow_name,
+        "agents": agents,
+        "agent_index": agent_index,
+        "tasks": tasks,
+        "task_index": task_index,
+        "graph": graph,
+        "order": order,
+        "warnings": warnings,
+    }
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _tools_key(known_tools: Optional[Iterable[str]]) -> Optional[str]:
+    return None if known_tools is None else hashlib.sha256("\n".join(sorted(known_tools)).encode()).hexdigest()
+
+
+def load_flow_spec(flow_path: Path, known_tools: Optional[Iterable[str]] = None, cache_dir: Path = CACHE_DIR) -> Dict[str, Any]:
+    """Скомпилированная спецификация flow. Кэш проверяется по mtime и размеру файлов,
+    при расхождении - по хэшу содержимого; YAML разбирается только если файлы действительно изменились"""
+    flow_name = flow_path.name
+    sources = [flow_path / name for name in SOURCE_FILES]
+    for path in sources:
+        if not path.exists():
+            raise FileNotFoundError(f"Config file not found: {path}")
+    known_tools = sorted(known_tools) if known_tools is not None else None
+    tools_key = _tools_key(known_tools)
+    cache_path = cache_dir / f"{flow_name}.json"
+
+    cached = None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    stats = {path.name: path.stat() for path in sources}
+    if cached and cached.get("version") == SPEC_VERSION and cached.get("tools") == tools_key:
+        entries = cached["sources"]
+        if all(
+            name in entries and entries[name]["mtime_ns"] == st.st_mtime_ns and entries[name]["size"] == st.st_size
+            for name, st in stats.items()
+        ):
+            return cached["spec"]
+        hashes = {path.name: _file_hash(path) for path in sources}
+        if all(name in entries and entries[name]["sha256"] == digest for name, digest in hashes.items()):
+            # Файлы перезаписаны без изменений - обновляем только mtime
+            for name, st in stats.items():
+                entries[name].update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            _write_cache(cache_path, cached)
+            return cached["spec"]
+
+    spec = compile_flow(flow_name, load_yaml(sources[0]), load_yaml(sources[1]), known_tools)
+    _write_cache(cache_path, {
+        "version": SPEC_VERSION,
+        "tools": tools_key,
+        "sources": {
+            path.name: {"mtime_ns": stats[path.name].st_mtime_ns, "size": stats[path.name].st_size, "sha256": _file_hash(path)}
+            for path in sources
+        },
+        "spec": spec,
+    })
+    return spec
+
+
+def _write_cache(cache_path: Path, data: Dict[str, Any]):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, cache_path)
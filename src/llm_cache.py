@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import telemetry
+from llm_router import call_with_served_model
+
+# Кэш ответов LLM включается явно: LLM_CACHE=on (чтение и запись) или replay (только чтение, промах - ошибка)
+CACHE_MODES = ("off", "on", "replay")
+CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "llm_cache.sqlite"
+MAX_SIZE_MB = 200           # Общий размер ответов, после которого вытесняются давно не использованные
+MAX_AGE_DAYS = 30           # Ответы старше удаляются независимо от использования
+
+
+class CacheMiss(RuntimeError):
+    """Ответа нет в кэше, а режим replay запрещает обращаться к провайдеру"""
+
+
+def cache_key(model: str, messages: Any, temperature: Any, tools: Any) -> str:
+    """Хэш запроса: модель, сообщения, температура и инструменты"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "tools": tools},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Ответы LLM в SQLite с вытеснением по размеру (LRU) и возрасту. Один объект на все потоки"""
+
+    def __init__(self, path: Path = CACHE_PATH, mode: str = "on", max_size_mb: float = MAX_SIZE_MB, max_age_days: float = MAX_AGE_DAYS):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of: {', '.join(CACHE_MODES)}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_used REAL
+            )"""
+        )
+        self.conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        if self.mode == "replay": return
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self.conn.commit()
+            self.stats["stores"] += 1
+
+    def evict(self):
+        """Удаление устаревших ответов, затем давно не использованных - пока кэш больше лимита"""
+        if self.mode == "replay": return
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)).rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes: break
+                    stale.append((key,))
+                    total -= size
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                deleted += len(stale)
+            self.conn.commit()
+            self.stats["evicted"] += deleted
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0.0
+        return (f"💾 LLM cache ({self.mode}): {self.stats['hits']} hits, {self.stats['misses']} misses "
+                f"({hit_rate:.0f}% hit rate), {self.stats['stores']} stored, {self.stats['evicted']} evicted")
+
+    def close(self):
+        """Закрытие соединения; закрытый общий кэш процесса сбрасывается - get_cache() откроет новый"""
+        global _cache
+        self.evict()
+        self.conn.close()
+        with _cache_lock:
+            if _cache is self: _cache = None
+
+
+def wrap_llm(llm: Any, cache: LLMCache) -> Any:
+    """Подмена llm.call на версию с кэшем. Кэшируются только текстовые ответы"""
+    original_call = llm.call
+
+    def cached_call(messages: Any, tools: Any = None, *args: Any, **kwargs: Any) -> Any:
+        key = cache_key(llm.model, messages, getattr(llm, "temperature", None), tools)
+        cached = cache.get(key)
+        telemetry.cache_event("hits" if cached is not None else "misses")
+        if cached is not None:
+            return cached
+        if cache.mode == "replay":
+            raise CacheMiss(f"No cached response for {llm.model} (key {key[:12]}) in replay mode")
+        response, served_model = call_with_served_model(original_call, messages, tools, *args, **kwargs)
+        # Ответ запасной модели не кэшируется: ключ - по основной модели, и при повторе он выдавался бы за ее ответ
+        if isinstance(response, str) and (served_model or llm.model) == llm.model and cache.mode != "replay":
+            cache.put(key, served_model or llm.model, response)
+            telemetry.cache_event("stores")
+        return response
+
+    # object.__setattr__ - LLM может быть pydantic-моделью без поля call
+    object.__setattr__(llm, "call", cached_call)
+    return llm
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Общий кэш процесса по настройкам из окружения (LLM_CACHE, LLM_CACHE_PATH, LLM_CACHE_MAX_MB, LLM_CACHE_MAX_AGE_DAYS)"""
+    global _cache
+    mode = os.getenv("LLM_CACHE", "off").lower()
+    if mode == "off": return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                Path(os.getenv("LLM_CACHE_PATH", str(CACHE_PATH))),
+                mode,
+                float(os.getenv("LLM_CACHE_MAX_MB", MAX_SIZE_MB)),
+                float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", MAX_AGE_DAYS)),
+            )
+    return _cache
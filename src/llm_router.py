@@ -0,0 +1,179 @@
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Провайдер считается упавшим, если из последних ROUTER_WINDOW вызовов (не меньше ROUTER_MIN_CALLS)
+# ошибкой закончилась доля ROUTER_ERROR_RATE или подряд упали ROUTER_CONSECUTIVE_FAILURES вызовов.
+# Тогда цепь размыкается на ROUTER_COOLDOWN секунд и запросы идут к следующему провайдеру из списка
+ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", 20))
+ROUTER_MIN_CALLS = int(os.getenv("LLM_ROUTER_MIN_CALLS", 4))
+ROUTER_ERROR_RATE = float(os.getenv("LLM_ROUTER_ERROR_RATE", 0.5))
+ROUTER_CONSECUTIVE_FAILURES = int(os.getenv("LLM_ROUTER_CONSECUTIVE_FAILURES", 3))
+ROUTER_COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", 30))
+# Провайдер с медианой задержки выше порога - рабочий, но получает запросы только после быстрых
+ROUTER_SLOW_SECONDS = float(os.getenv("LLM_ROUTER_SLOW_SECONDS", 60))
+# Ошибки запроса, а не провайдера: переключение на другую модель их не исправит (CrewAI обрабатывает сам)
+REQUEST_ERRORS = ("ContextWindowExceeded", "ContextLengthExceeded")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Модель, которая ответила на вызов маршрутизатора (основная или запасная) - для кэша ответов
+_served_model: ContextVar[Optional[str]] = ContextVar("served_model", default=None)
+
+
+class NoHealthyProvider(RuntimeError):
+    """У всех провайдеров агента разомкнута цепь - запрос не отправлялся"""
+
+
+class ProviderHealth:
+    """Скользящее окно результатов вызовов провайдера и состояние цепи"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcomes: deque = deque(maxlen=ROUTER_WINDOW)     # (успех, секунды)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._probe_thread: Optional[int] = None
+        self.stats = {"calls": 0, "failures": 0, "opened": 0}
+        self._lock = threading.Lock()
+
+    def error_rate(self) -> float:
+        if not self.outcomes: return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def latency_p50(self) -> Optional[float]:
+        latencies = [seconds for ok, seconds in self.outcomes if ok]
+        return statistics.median(latencies) if latencies else None
+
+    def is_slow(self) -> bool:
+        p50 = self.latency_p50()
+        return p50 is not None and p50 > ROUTER_SLOW_SECONDS
+
+    def acquire(self) -> bool:
+        """Можно ли отправить запрос. После паузы разомкнутая цепь пропускает один пробный вызов"""
+        with self._lock:
+            if self.state == CLOSED: return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= ROUTER_COOLDOWN:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def end_probe(self):
+        """Пробный вызов этого потока завершен любым исходом (и KeyboardInterrupt, и отменой) - можно следующий"""
+        with self._lock:
+            if self._probe_thread == threading.get_ident():
+                self.probe_in_flight = False
+                self._probe_thread = None
+
+    def record(self, ok: bool, seconds: float):
+        with self._lock:
+            self.outcomes.append((ok, seconds))
+            self.stats["calls"] += 1
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    # Пробный вызов прошел - провайдер снова в строю, старые ошибки забываем
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                    self.outcomes.append((ok, seconds))
+            else:
+                self.stats["failures"] += 1
+                self.consecutive_failures += 1
+                if self.state == HALF_OPEN or self._failing():
+                    if self.state != OPEN: self.stats["opened"] += 1
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+
+    def _failing(self) -> bool:
+        if self.consecutive_failures >= ROUTER_CONSECUTIVE_FAILURES: return True
+        return len(self.outcomes) >= ROUTER_MIN_CALLS and self.error_rate() >= ROUTER_ERROR_RATE
+
+    def summary(self) -> str:
+        p50 = self.latency_p50()
+        latency = f"{p50:.2f}s p50" if p50 is not None else "no successful calls"
+        return (f"{self.name}: {self.state}, {self.stats['calls']} calls, {self.stats['failures']} failed "
+                f"({self.error_rate() * 100:.0f}% of last {len(self.outcomes)}), {latency}, "
+                f"circuit opened {self.stats['opened']}x")
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def provider_health(name: str) -> ProviderHealth:
+    """Общее состояние провайдера для всех агентов процесса: 429 у одного агента - сигнал для всех"""
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = ProviderHealth(name)
+    return health
+
+
+def provider_name(llm: Any) -> str:
+    base_url = getattr(llm, "base_url", None)
+    return f"{llm.model} @ {base_url}" if base_url else llm.model
+
+
+def _is_request_error(error: BaseException) -> bool:
+    return any(marker in type(error).__name__ for marker in REQUEST_ERRORS)
+
+
+def route_llm(primary: Any, fallbacks: List[Any]) -> Any:
+    """Подмена primary.call на маршрутизатор: провайдеры пробуются по порядку (быстрые раньше медленных),
+    провайдеры с разомкнутой цепью пропускаются, ошибка провайдера - переход к следующему"""
+    providers: List[Tuple[ProviderHealth, str, Any]] = [
+        (provider_health(provider_name(llm)), llm.model, llm.call) for llm in [primary, *fallbacks]
+    ]
+
+    def routed_call(messages: Any, tools: Any = None, *args: Any, **kwargs: Any) -> Any:
+        # sorted устойчива: среди одинаково быстрых сохраняется порядок из agents.yaml
+        candidates = sorted(providers, key=lambda item: item[0].is_slow())
+        last_error: Optional[BaseException] = None
+        for health, model, call in candidates:
+            if not health.acquire(): continue
+            started = time.perf_counter()
+            try:
+                response = call(messages, tools, *args, **kwargs)
+            except Exception as e:
+                if _is_request_error(e):
+                    health.record(True, time.perf_counter() - started)
+                    raise
+                health.record(False, time.perf_counter() - started)
+                print(f"    🔀 {health.name} failed ({type(e).__name__}: {str(e)[:120]}), trying next provider")
+                last_error = e
+                continue
+            finally:
+                health.end_probe()
+            health.record(True, time.perf_counter() - started)
+            _served_model.set(model)
+            return response
+        if last_error is not None: raise last_error
+        raise NoHealthyProvider("All providers have an open circuit: " + ", ".join(h.name for h, _, _ in providers))
+
+    object.__setattr__(primary, "call", routed_call)
+    return primary
+
+
+def call_with_served_model(call: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Optional[str]]:
+    """Вызов LLM и модель, которая на него ответила (None - вызов шел не через маршрутизатор)"""
+    token = _served_model.set(None)
+    try:
+        return call(*args, **kwargs), _served_model.get()
+    finally:
+        _served_model.reset(token)
+
+
+def health_summary() -> List[str]:
+    with _health_lock:
+        healths = list(_health.values())
+    if not any(h.stats["failures"] for h in healths): return []
+    return ["🔀 LLM providers:"] + [f"    {h.summary()}" for h in healths]
@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
 import sys
 import os
-import asyncio
 import signal
-import yaml
-import datetime
+import argparse
+import json
+import time
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib.metadata import EntryPoint, entry_points
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
 from dotenv import load_dotenv
 
 # --- WINDOWS PATCHES ---
 if sys.platform.startswith('win'):
+    import asyncio
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     unix_signals = ['SIGABRT', 'SIGALRM', 'SIGBUS', 'SIGCHLD', 'SIGCONT', 'SIGFPE', 'SIGHUP', 'SIGILL', 'SIGINT', 'SIGIO', 'SIGIOT', 'SIGKILL', 'SIGPIPE', 'SIGPOLL', 'SIGPROF', 'SIGPWR', 'SIGQUIT', 'SIGSEGV', 'SIGSTOP', 'SIGSYS', 'SIGTERM', 'SIGTRAP', 'SIGTSTP', 'SIGTTIN', 'SIGTTOU', 'SIGURG', 'SIGUSR1', 'SIGUSR2', 'SIGVTALRM', 'SIGWINCH', 'SIGXCPU', 'SIGXFSZ']
     for name in unix_signals:
@@ -18,9 +23,20 @@ if sys.platform.startswith('win'):
             try: setattr(signal, name, getattr(signal, 'SIGTERM', 1))
             except AttributeError: setattr(signal, name, 1)
 
-from crewai import Agent, Task, Crew, Process, LLM
-# ИМПОРТ ИНСТРУМЕНТОВ
-from crewai_tools import SerperDevTool, FileWriterTool
+# CrewAI и crewai_tools импортируются только при запуске flow: меню, --list и --validate обходятся без них
+if TYPE_CHECKING:
+    from crewai import Agent, Task
+
+from llm_cache import get_cache, wrap_llm
+from llm_router import health_summary, route_llm
+from context_compress import CONTEXT_TOKEN_BUDGET, compress_parts, format_stats
+from brain_index import search_brain
+from flow_spec import FlowSpecError, load_flow_spec, load_yaml
+from prompts import PromptRegistry, get_prompt_registry
+from run_store import RunStore, chain_hashes, find_run_dir
+from scheduler import Graph, format_schedule_report, run_dag
+import telemetry
+from telemetry import RunMetrics
 
 load_dotenv()
 
@@ -28,123 +44,355 @@ BASE_DIR = Path(__file__).resolve().parent
 CONFIG_DIR = BASE_DIR / "config"
 OUTPUT_DIR = BASE_DIR / "outputs"
 
-def load_yaml(path: Path) -> Dict[str, Any]:
-    if not path.exists():
-        raise FileNotFoundError(f"Config file not found: {path}")
-    with open(path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f) or {}
+# Сколько задач flow выполняется одновременно (задачи без общих зависимостей)
+MAX_PARALLEL_TASKS = int(os.getenv("FLOW_MAX_PARALLEL", 4))
+# Сколько запусков flow одновременно в пакетном режиме (--batch)
+BATCH_WORKERS = 4
+# Разделитель результатов задач в context - как в CrewAI
+CONTEXT_DIVIDER = "\n\n----------\n\n"
 
-def get_llm(model_name: str):
-    if not model_name: return None
-    print(f"    ⚙️ Configuring LLM: {model_name}")
-    
-    api_key = None
-    if "gemini" in model_name: api_key = os.getenv("GEMINI_API_KEY")
-    elif "groq" in model_name: api_key = os.getenv("GROQ_API_KEY")
-    elif "deepseek" in model_name: api_key = os.getenv("DEEPSEEK_API_KEY")
-    elif "gpt" in model_name: api_key = os.getenv("OPENAI_API_KEY")
-    
-    return LLM(model=model_name, api_key=api_key)
+# --- РЕЕСТР LLM ---
+# Переменная с API-ключом по умолчанию (по подстроке в имени модели)
+PROVIDER_KEY_ENVS = [
+    ("gemini", "GEMINI_API_KEY"),
+    ("groq", "GROQ_API_KEY"),
+    ("deepseek", "DEEPSEEK_API_KEY"),
+    ("gpt", "OPENAI_API_KEY"),
+    ("qwen", "DASHSCOPE_API_KEY"),
+]
+
+_llm_registry: Dict[tuple, Any] = {}
+_llm_registry_lock = threading.Lock()
+
+def resolve_llm_config(llm_config: Any) -> Dict[str, Any]:
+    """`llm:` из agents.yaml - строка с моделью или словарь {model, api_key_env, base_url, ...параметры LLM}"""
+    config = {"model": llm_config} if isinstance(llm_config, str) else dict(llm_config)
+    if not config.get("model"):
+        raise ValueError(f"LLM config without model: {llm_config}")
+    if "api_key_env" not in config:
+        config["api_key_env"] = next((env for marker, env in PROVIDER_KEY_ENVS if marker in config["model"]), None)
+    return config
+
+def _llm_key(config: Dict[str, Any]) -> tuple:
+    params = {k: v for k, v in config.items() if k not in ("model", "api_key_env", "base_url")}
+    return (config["model"], config["api_key_env"], config.get("base_url"), tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+def _build_llm(config: Dict[str, Any]) -> Any:
+    from crewai import LLM
+    params = dict(config)
+    model = params.pop("model")
+    api_key_env = params.pop("api_key_env")
+    base_url = params.get("base_url")
+    print(f"    ⚙️ Configuring LLM: {model}" + (f" ({base_url})" if base_url else ""))
+    llm = LLM(model=model, api_key=os.getenv(api_key_env) if api_key_env else None, **params)
+    # Метрики на каждом провайдере: упавший вызов перед переключением на запасной считается повтором
+    return telemetry.instrument_llm(llm)
+
+def get_llm(llm_config: Any, fallbacks: Optional[List[Any]] = None):
+    """Один общий клиент на (модель, ключ, base_url, параметры) и список запасных моделей -
+    агенты на одной модели делят соединения. С fallbacks запросы идут через маршрутизатор провайдеров"""
+    if not llm_config: return None
+    configs = [resolve_llm_config(c) for c in [llm_config, *(fallbacks or [])]]
+    registry_key = tuple(_llm_key(config) for config in configs)
+
+    with _llm_registry_lock:
+        llm = _llm_registry.get(registry_key)
+        if llm is None:
+            clients = [_build_llm(config) for config in configs]
+            llm = clients[0]
+            if len(clients) > 1:
+                print(f"    🔀 Fallbacks for {llm.model}: {', '.join(c.model for c in clients[1:])}")
+                llm = route_llm(llm, clients[1:])
+            # Кэш снаружи маршрутизатора и метрик: ответы из кэша не считаются вызовами LLM
+            cache = get_cache()
+            if cache: llm = wrap_llm(llm, cache)
+            _llm_registry[registry_key] = llm
+    return llm
+
+# --- РЕЕСТР ИНСТРУМЕНТОВ ---
+# Имя в agents.yaml -> "модуль:Класс". Дополнить можно через config/tools.yaml, <flow>/tools.yaml
+# или entry points группы TOOL_ENTRY_POINT_GROUP
+BUILTIN_TOOLS: Dict[str, Any] = {
+    "web_search": "crewai_tools:SerperDevTool",
+    "file_write": "crewai_tools:FileWriterTool", # Позволяет агентам создавать файлы
+    "web_scrape": "crewai_tools:ScrapeWebsiteTool",
+    "brain_search": "brain_index:brain_search_tool", # Поиск по Agency_Brain и Projects/*/data без сети
+}
+TOOL_ENTRY_POINT_GROUP = "ai_agency.tools"
+
+_tool_specs: Dict[str, Any] = dict(BUILTIN_TOOLS)
+_tool_instances: Dict[str, Any] = {}
+_tools_lock = threading.Lock()
+_tool_entry_points_loaded = False
+
+def known_tool_names() -> List[str]:
+    """Все имена инструментов, доступные flow (без создания самих инструментов)"""
+    with _tools_lock:
+        _load_tool_entry_points()
+        return list(_tool_specs)
+
+def register_tool(name: str, spec: Any):
+    """spec - "модуль:Класс", {"class": "модуль:Класс", "args": {...}}, entry point или фабрика"""
+    with _tools_lock:
+        _tool_specs[name] = spec
+        _tool_instances.pop(name, None)
+
+def load_tool_config(path: Path):
+    """Регистрация инструментов из YAML: имя -> spec"""
+    if not path.exists(): return
+    for name, spec in load_yaml(path).items():
+        register_tool(name, spec)
+
+def _load_tool_entry_points():
+    global _tool_entry_points_loaded
+    if _tool_entry_points_loaded: return
+    _tool_entry_points_loaded = True
+    for entry_point in entry_points(group=TOOL_ENTRY_POINT_GROUP):
+        _tool_specs.setdefault(entry_point.name, entry_point)
+
+def _build_tool(spec: Any) -> Any:
+    args = {}
+    if isinstance(spec, dict):
+        args = spec.get("args") or {}
+        spec = spec["class"]
+    if isinstance(spec, str):
+        module_name, _, attr = spec.partition(":")
+        factory = getattr(importlib.import_module(module_name), attr)
+    elif isinstance(spec, EntryPoint):
+        factory = spec.load()
+    else:
+        factory = spec
+    return factory(**args)
+
+def get_tool(name: str) -> Any:
+    """Инструмент создается при первом обращении и дальше переиспользуется всеми агентами"""
+    with _tools_lock:
+        tool = _tool_instances.get(name)
+        if tool is None:
+            if name not in _tool_specs: _load_tool_entry_points()
+            spec = _tool_specs.get(name)
+            if spec is None: return None
+            print(f"    🔧 Initializing tool: {name}")
+            tool = _tool_instances[name] = _build_tool(spec)
+    return tool
 
-# --- ФАБРИКА ИНСТРУМЕНТОВ ---
 def get_tools_objects(tool_names: List[str]) -> List[Any]:
     if not tool_names: return []
     
     tools = []
-    
-    # Инициализация инструментов
-    search_tool = SerperDevTool()
-    file_writer = FileWriterTool() # Позволяет агентам создавать файлы
-    
-    tool_registry = {
-        "web_search": search_tool,
-        "file_write": file_writer, 
-    }
-    
     for name in tool_names:
-        tool = tool_registry.get(name)
+        tool = get_tool(name)
         if tool:
             tools.append(tool)
         else:
             print(f"    ⚠️ WARNING: Tool '{name}' not found in registry.")
     return tools
 
-def create_agents(agents_config: Dict[str, Any]) -> Dict[str, Agent]:
-    agents_map = {}
-    iterator = agents_config.items() if isinstance(agents_config, dict) else {item.get('role', f'a{i}'): item for i, item in enumerate(agents_config)}.items()
+# --- ПРОМПТЫ ---
+def prompt_registry(flow_name: str) -> PromptRegistry:
+    """Промпты flow: сначала config/<flow>/prompts, затем общие config/prompts"""
+    return get_prompt_registry(CONFIG_DIR / flow_name / "prompts", CONFIG_DIR / "prompts")
 
-    for key, config in iterator:
-        if not config: continue
-        
+def check_prompts(spec: Dict[str, Any]):
+    """Все файлы prompt из agents.yaml на месте и разбираются - иначе flow не запускается"""
+    names = [config["prompt"] for config in spec["agents"].values() if config.get("prompt")]
+    problems = prompt_registry(spec["flow"]).check(names)
+    if problems: raise FlowSpecError(spec["flow"], problems)
+
+def agent_backstory(spec: Dict[str, Any], config: Dict[str, Any]) -> str:
+    """backstory из agents.yaml или текст файла prompt; {inputs} в нем подставляет CrewAI"""
+    if config.get("prompt"): return prompt_registry(spec["flow"]).get(config["prompt"]).source
+    return config.get("backstory")
+
+def create_agents(spec: Dict[str, Any]) -> Dict[str, "Agent"]:
+    """Агенты по ключам из скомпилированной спецификации flow"""
+    from crewai import Agent
+    agents_map = {}
+    for key, config in spec["agents"].items():
         tool_names = config.get('tools', [])
         agent_tools = get_tools_objects(tool_names)
         
-        agent = Agent(
+        agents_map[key] = Agent(
             role=config.get('role'),
             goal=config.get('goal'),
-            backstory=config.get('backstory'),
+            backstory=agent_backstory(spec, config),
             verbose=config.get('verbose', True),
             allow_delegation=False,
-            llm=get_llm(config.get('llm')),
-            tools=agent_tools
+            llm=get_llm(config.get('llm'), config.get('llm_fallbacks')),
+            tools=agent_tools,
+            step_callback=telemetry.step_callback
         )
-        agents_map[key] = agent
-        if 'name' in config: agents_map[config['name']] = agent
     return agents_map
 
-def create_tasks(tasks_config: Dict[str, Any], agents_map: Dict[str, Agent]) -> List[Task]:
-    tasks_objects = []
+def create_tasks(spec: Dict[str, Any], agents_map: Dict[str, "Agent"]) -> List["Task"]:
+    """Задачи в порядке tasks.yaml; агент и context уже разрешены компилятором flow"""
+    from crewai import Task
     tasks_registry = {}
-    
-    raw_tasks = []
-    if isinstance(tasks_config, list):
-        for i, item in enumerate(tasks_config): raw_tasks.append((f"task_{i}", item))
-    else:
-        for key, item in tasks_config.items(): raw_tasks.append((key, item))
-
-    for key, config in raw_tasks:
-        agent_ref = config.get('agent')
-        assigned_agent = agents_map.get(agent_ref)
-        if not assigned_agent:
-             for a_obj in agents_map.values():
-                if a_obj.role == agent_ref:
-                    assigned_agent = a_obj
-                    break
-        if not assigned_agent:
-            print(f"CRITICAL: Agent '{agent_ref}' not found")
-            sys.exit(1)
-
-        task = Task(
-            name=config.get('name', key),
+    for item in spec["tasks"]:
+        config = item["config"]
+        tasks_registry[item["key"]] = Task(
+            name=config.get('name', item["key"]),
             description=config.get('description'),
             expected_output=config.get('expected_output'),
-            agent=assigned_agent,
-            async_execution=config.get('async_execution', False)
+            agent=agents_map[item["agent"]],
+            async_execution=config.get('async_execution', False),
+            callback=telemetry.task_callback
         )
-        tasks_objects.append(task)
-        tasks_registry[key] = task
-        if config.get('name'): tasks_registry[config.get('name')] = task
-
-    for i, (key, config) in enumerate(raw_tasks):
-        context_names = config.get('context', [])
-        if context_names:
-            context_tasks = [tasks_registry[c] for c in context_names if c in tasks_registry]
-            if context_tasks: tasks_objects[i].context = context_tasks
-
-    return tasks_objects
-
-def save_result(flow_name: str, result: str):
-    target_dir = OUTPUT_DIR / flow_name
-    target_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filepath = target_dir / f"report_{timestamp}.md"
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(str(result))
+
+    for item in spec["tasks"]:
+        if item["context"]:
+            tasks_registry[item["key"]].context = [tasks_registry[c] for c in item["context"]]
+
+    return list(tasks_registry.values())
+
+def _interpolate_inputs(agents: List["Agent"], tasks: List["Task"], inputs: Dict[str, str]):
+    """Подстановка {inputs} в промпты - то же, что делает crew.kickoff(inputs=...)"""
+    for agent in agents:
+        agent.interpolate_inputs(inputs)
+    for task in tasks:
+        if hasattr(task, "interpolate_inputs_and_add_conversation_history"):
+            task.interpolate_inputs_and_add_conversation_history(inputs)
+        else:
+            task.interpolate_inputs(inputs)
+
+def run_flow(agents_map: Dict[str, "Agent"], tasks: List["Task"], graph: Graph, inputs: Dict[str, str],
+             run: Optional[RunStore] = None, completed: Optional[Dict[str, str]] = None,
+             metrics: Optional[RunMetrics] = None, context_budgets: Optional[Dict[str, int]] = None,
+             knowledge: Optional[Dict[str, int]] = None, contexts: Optional[Dict[str, List[str]]] = None) -> Any:
+    """Запуск задач по графу зависимостей: независимые задачи выполняются параллельно.
+    Граф сохраняет порядок Process.sequential (задача ждет предыдущую, следующая не ждет async_execution),
+    параллельно с предыдущими - только задачи с parallel: true. contexts (ключ -> задачи) - чьи результаты
+    передаются задаче как context, по умолчанию - результаты всех ее зависимостей.
+    Задачи выполняются без Crew: память crew, agent.crew и callbacks уровня crew недоступны.
+    С run результат каждой задачи сохраняется на диск сразу после ее завершения,
+    задачи из completed (продолжение запуска) не выполняются - берется сохраненный результат.
+    Context задачи сжимается под ее бюджет токенов (context_budgets, по умолчанию CONTEXT_TOKEN_BUDGET).
+    Агентам из knowledge (ключ -> k) в backstory добавляются k фрагментов базы знаний по их роли и цели.
+    Результат flow - результат последней задачи из tasks.yaml, как у Process.sequential"""
+    agents = list({id(agent): agent for agent in agents_map.values()}.values())
+    _interpolate_inputs(agents, tasks, inputs)
+    # После подстановки inputs: фрагменты могут содержать фигурные скобки
+    for agent_key, top_k in (knowledge or {}).items():
+        agent = agents_map[agent_key]
+        snippets = search_brain(f"{agent.role} {agent.goal}", top_k)
+        if snippets: agent.backstory = f"{agent.backstory}\n\nKnowledge base:\n{snippets}"
+    tasks_by_key = dict(zip(graph, tasks))
+
+    def run_task(key: str, dependency_outputs: List[Any]) -> Any:
+        context_outputs = dependency_outputs
+        if contexts is not None:
+            by_dependency = dict(zip(graph[key], dependency_outputs))
+            context_outputs = [by_dependency[ref] for ref in contexts[key]]
+        if completed and key in completed:
+            print(f"\n♻️ Task restored from checkpoint: {key}")
+            if metrics: metrics.reused(key)
+            return completed[key]
+        task = tasks_by_key[key]
+        print(f"\n▶️ Task started: {key}")
+        if context_outputs:
+            budget = (context_budgets or {}).get(key, CONTEXT_TOKEN_BUDGET)
+            context_outputs, stats = compress_parts(context_outputs, f"{task.description}\n{task.expected_output}", budget)
+            if stats["tokens_out"] < stats["tokens_in"]: print(f"    🗜️ Context compressed: {format_stats(stats)}")
+            if metrics: metrics.record_context(key, stats["tokens_in"], stats["tokens_out"])
+        context = CONTEXT_DIVIDER.join(str(output) for output in context_outputs) or None
+        if run: run.task_started(key)
+        try:
+            if metrics:
+                with metrics.task(key, task.agent):
+                    output = task.execute_sync(agent=task.agent, context=context)
+            else:
+                output = task.execute_sync(agent=task.agent, context=context)
+        except Exception as e:
+            if run: run.task_failed(key, e)
+            raise
+        if run: run.task_finished(key, output)
+        return output
+
+    # Один агент не выполняет две задачи одновременно - у него общий executor
+    groups = {key: id(task.agent) for key, task in tasks_by_key.items()}
+    result = run_dag(graph, run_task, MAX_PARALLEL_TASKS, groups)
+    print()
+    for line in format_schedule_report(graph, result): print(line)
+    if metrics:
+        for line in metrics.format_summary(): print(line)
+    return result.outputs[list(graph)[-1]]
+
+def task_hashes(spec: Dict[str, Any]) -> Dict[str, str]:
+    """Хэши задач для чекпоинтов: задача и ее агент, с учетом хэшей задач из context"""
+    definitions = {
+        item["key"]: {"task": item["config"], "agent": spec["agents"][item["agent"]],
+                      "backstory": agent_backstory(spec, spec["agents"][item["agent"]])}
+        for item in spec["tasks"]
+    }
+    return chain_hashes(definitions, spec["graph"])
+
+def execute_flow(flow_name: str, spec: Dict[str, Any], inputs: Dict[str, str], run_label: str = "",
+                 run: Optional[RunStore] = None, completed: Optional[Dict[str, str]] = None) -> Path:
+    """Один запуск flow: агенты, задачи, выполнение и сохранение результатов в папку запуска"""
+    agents_map = create_agents(spec)
+    tasks = create_tasks(spec, agents_map)
+    if run is None:
+        run = RunStore(OUTPUT_DIR / flow_name, flow_name, list(spec["graph"]), inputs, run_label, task_hashes(spec))
+    print(f"    📁 Run directory: {run.run_dir} (resume with --resume {run.run_id})")
+    metrics = RunMetrics(flow_name, run.run_id)
+    try:
+        budgets = {item["key"]: item["config"]["context_budget"] for item in spec["tasks"] if "context_budget" in item["config"]}
+        knowledge = {key: config["knowledge"] for key, config in spec["agents"].items() if config.get("knowledge")}
+        contexts = {item["key"]: item["context"] for item in spec["tasks"]}
+        run_flow(agents_map, tasks, spec["graph"], inputs, run, completed, metrics, budgets, knowledge, contexts)
+    except BaseException as e:
+        metrics_path = metrics.write(run.run_dir)
+        report_path = run.finish("failed", error=str(e), links=telemetry.METRICS_FILES)
+        print(f"\n⚠️ PARTIAL REPORT SAVED TO: {report_path}")
+        print(f"📊 METRICS: {metrics_path}")
+        raise
+    return save_result(run, metrics)
+
+def resume_flow(run_id: str) -> Path:
+    """Продолжение запуска: готовые задачи с неизменным определением берутся с диска,
+    измененные задачи и все задачи ниже них по графу выполняются заново"""
+    run = RunStore.open(find_run_dir(OUTPUT_DIR, run_id))
+    flow_name = run.manifest["flow"]
+    spec = load_flow(flow_name)
+    completed = run.prepare_resume(list(spec["graph"]), task_hashes(spec))
+    pending = [key for key in spec["graph"] if key not in completed]
+    print(f"\n♻️ Resuming run {run.run_id}: {len(completed)} tasks restored, {len(pending)} to run ({', '.join(pending) or 'none'})")
+    return execute_flow(flow_name, spec, run.manifest["inputs"], run=run, completed=completed)
+
+def save_result(run: RunStore, metrics: Optional[RunMetrics] = None) -> Path:
+    """Итоговый отчет запуска, собранный из уже сохраненных результатов задач, и метрики рядом с ним"""
+    metrics_path = metrics.write(run.run_dir) if metrics else None
+    filepath = run.finish("done", links=telemetry.METRICS_FILES if metrics else None)
     print(f"\n✅ REPORT SAVED TO: {filepath}")
+    if metrics_path: print(f"📊 METRICS: {metrics_path} (Prometheus: {telemetry.METRICS_PROM})")
+    return filepath
+
+def list_flows() -> List[str]:
+    if not CONFIG_DIR.exists(): return []
+    return sorted(d.name for d in CONFIG_DIR.iterdir() if d.is_dir())
+
+def validate_flows(flow_names: List[str]) -> bool:
+    """Проверка flow без создания агентов и без импорта CrewAI"""
+    load_tool_config(CONFIG_DIR / "tools.yaml")
+    ok = True
+    for flow_name in flow_names:
+        flow_path = CONFIG_DIR / flow_name
+        try:
+            load_tool_config(flow_path / "tools.yaml")
+            spec = load_flow_spec(flow_path, known_tool_names())
+            check_prompts(spec)
+        except Exception as e:
+            ok = False
+            print(f"❌ {flow_name}: {e}")
+            continue
+        print(f"✅ {flow_name}: {len(spec['agents'])} agents, {len(spec['tasks'])} tasks")
+        for warning in spec["warnings"]:
+            print(f"    ⚠️ WARNING: {warning}")
+    return ok
 
 def select_flow() -> str:
     if not CONFIG_DIR.exists(): os.makedirs(CONFIG_DIR); sys.exit(1)
-    flows = [d.name for d in CONFIG_DIR.iterdir() if d.is_dir()]
+    flows = list_flows()
     print("\n=== AI AGENCY LAUNCHER ===")
     for idx, flow in enumerate(flows, 1): print(f"[{idx}] {flow}")
     while True:
@@ -176,30 +424,119 @@ def get_user_input(flow_name: str) -> Dict[str, str]:
     if not text.strip(): return {"business_description": "Тестовый ввод."}
     return {"business_description": text}
 
+def load_flow(flow_name: str) -> Dict[str, Any]:
+    """Скомпилированная и проверенная спецификация flow; инструменты flow регистрируются в реестре"""
+    flow_path = CONFIG_DIR / flow_name
+    if not flow_path.is_dir():
+        raise FileNotFoundError(f"Flow not found: {flow_path}")
+    print(f"\n🚀 Initializing Flow: {flow_name}")
+    load_tool_config(CONFIG_DIR / "tools.yaml")
+    load_tool_config(flow_path / "tools.yaml")
+    spec = load_flow_spec(flow_path, known_tool_names())
+    check_prompts(spec)
+    for warning in spec["warnings"]:
+        print(f"    ⚠️ WARNING: {warning}")
+    return spec
+
+def finish_llm_clients():
+    """Итоги по LLM в конце работы: состояние провайдеров и кэш"""
+    for line in health_summary(): print(line)
+    cache = get_cache()
+    if cache:
+        print(cache.summary())
+        cache.close()
+
+def read_batch_inputs(path: Path) -> List[Dict[str, str]]:
+    """JSONL: одна строка - один запуск. Объект - inputs целиком, строка - business_description"""
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})")
+            items.append(item if isinstance(item, dict) else {"business_description": str(item)})
+    return items
+
+def run_batch(flow_name: str, inputs_path: Path, workers: int = BATCH_WORKERS):
+    """Пакетный запуск flow без ввода с клавиатуры: каждый набор inputs - отдельный запуск в пуле потоков.
+    Агенты и задачи у каждого запуска свои, LLM-клиенты и инструменты - общие из реестров"""
+    spec = load_flow(flow_name)
+    items = read_batch_inputs(inputs_path)
+    print(f"\n📦 Batch: {len(items)} runs of {flow_name}, {workers} at a time")
+
+    def run_one(index: int, inputs: Dict[str, str]) -> float:
+        run_started = time.perf_counter()
+        execute_flow(flow_name, spec, inputs, f"{index:04d}")
+        return time.perf_counter() - run_started
+
+    started = time.perf_counter()
+    failed = []
+    durations = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(run_one, i, inputs): i for i, inputs in enumerate(items, 1)}
+            for done_count, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                try:
+                    durations.append(future.result())
+                    print(f"📦 [{done_count}/{len(items)}] run {index} done")
+                except Exception as e:
+                    failed.append(index)
+                    print(f"📦 [{done_count}/{len(items)}] run {index} FAILED: {e}")
+    finally:
+        finish_llm_clients()
+
+    elapsed = time.perf_counter() - started
+    succeeded = len(items) - len(failed)
+    print(f"\n📊 Batch summary: {succeeded}/{len(items)} succeeded in {elapsed:.1f}s "
+          f"({succeeded / elapsed * 60 if elapsed else 0:.1f} runs/min)")
+    if durations:
+        print(f"    Avg run time: {sum(durations) / len(durations):.1f}s, max: {max(durations):.1f}s")
+    if failed:
+        print(f"    Failed runs: {', '.join(map(str, sorted(failed)))}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI Agency launcher")
+    parser.add_argument("--flow", help="Flow name (folder in config/); without it the flow is chosen from the menu")
+    parser.add_argument("--batch", type=Path, help="JSONL file with inputs, one run per line")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Concurrent runs in batch mode")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a failed run from its checkpoints")
+    parser.add_argument("--list", action="store_true", help="List flows and exit")
+    parser.add_argument("--validate", action="store_true", help="Validate --flow (or all flows) and exit")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.list:
+        for flow_name in list_flows(): print(flow_name)
+        return
+    if args.validate:
+        sys.exit(0 if validate_flows([args.flow] if args.flow else list_flows()) else 1)
     try:
-        flow_name = select_flow()
-        flow_path = CONFIG_DIR / flow_name
-        
-        print(f"\n🚀 Initializing Flow: {flow_name}")
-        agents_yaml = load_yaml(flow_path / "agents.yaml")
-        tasks_yaml = load_yaml(flow_path / "tasks.yaml")
-        
-        agents_map = create_agents(agents_yaml)
-        tasks = create_tasks(tasks_yaml, agents_map)
-        
+        if args.resume:
+            try:
+                resume_flow(args.resume)
+            finally:
+                finish_llm_clients()
+            return
+
+        if args.batch:
+            if not args.flow:
+                raise ValueError("--batch requires --flow")
+            run_batch(args.flow, args.batch, args.workers)
+            return
+
+        flow_name = args.flow or select_flow()
+        spec = load_flow(flow_name)
         inputs = get_user_input(flow_name)
         
-        crew = Crew(
-            agents=list(agents_map.values()),
-            tasks=tasks,
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        print("\n🔥 Kicking off the Crew...")
-        result = crew.kickoff(inputs=inputs)
-        save_result(flow_name, result)
+        print(f"\n🔥 Kicking off the Crew (up to {MAX_PARALLEL_TASKS} tasks in parallel)...")
+        try:
+            execute_flow(flow_name, spec, inputs)
+        finally:
+            finish_llm_clients()
 
     except Exception as e:
         print(f"\n❌ FATAL ERROR: {e}")
@@ -207,4 +544,4 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,106 @@
+import string
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Как часто проверять mtime файла промпта: между проверками промпт берется из памяти без обращения к диску
+RELOAD_CHECK_SECONDS = 2.0
+
+
+class PromptError(ValueError):
+    """Промпт не удалось разобрать или заполнить"""
+
+
+class PromptNotFoundError(FileNotFoundError):
+    """Файла промпта нет ни в одной папке реестра"""
+
+
+class PromptTemplate:
+    """Промпт из файла, разобранный в шаблон с полями {name} (как str.format, {{ }} - скобки как текст)"""
+
+    def __init__(self, name: str, path: Path, source: str, mtime_ns: int):
+        self.name = name
+        self.path = path
+        self.source = source
+        self.mtime_ns = mtime_ns
+        self.checked_at = time.monotonic()
+        try:
+            self.segments: List[Tuple[str, Optional[str]]] = [
+                (literal, field) for literal, field, _, _ in string.Formatter().parse(source)
+            ]
+        except ValueError as e:
+            raise PromptError(f"Prompt {path}: {e}")
+        self.fields = sorted({field for _, field in self.segments if field is not None})
+        for field in self.fields:
+            if not field.isidentifier():
+                raise PromptError(f"Prompt {path}: invalid placeholder {{{field}}}")
+
+    def render(self, /, **values: Any) -> str:
+        """Подстановка значений; незаполненное поле - ошибка, лишние значения игнорируются"""
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise PromptError(f"Prompt {self.name}: no value for {', '.join('{' + f + '}' for f in missing)}")
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in self.segments)
+
+
+class PromptRegistry:
+    """Промпты по имени файла из папок search_dirs (первая найденная). Файл читается один раз
+    и перечитывается, только если изменился его mtime. Отсутствующий промпт - ошибка, а не заглушка"""
+
+    def __init__(self, search_dirs: Iterable[Path]):
+        self.search_dirs = [Path(d) for d in search_dirs]
+        self._prompts: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _find(self, name: str) -> Path:
+        for directory in self.search_dirs:
+            path = directory / name
+            if path.is_file(): return path
+        raise PromptNotFoundError(
+            f"Prompt '{name}' not found in: {', '.join(str(d) for d in self.search_dirs)}")
+
+    def get(self, name: str) -> PromptTemplate:
+        with self._lock:
+            prompt = self._prompts.get(name)
+            now = time.monotonic()
+            if prompt is not None and now - prompt.checked_at < RELOAD_CHECK_SECONDS:
+                return prompt
+            path = prompt.path if prompt is not None else self._find(name)
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                # Файл удалили или переместили - ищем заново (возможно, он есть в другой папке)
+                path = self._find(name)
+                mtime_ns = path.stat().st_mtime_ns
+            if prompt is None or prompt.path != path or prompt.mtime_ns != mtime_ns:
+                prompt = self._prompts[name] = PromptTemplate(name, path, path.read_text(encoding="utf-8"), mtime_ns)
+            prompt.checked_at = now
+            return prompt
+
+    def render(self, name: str, /, **values: Any) -> str:
+        return self.get(name).render(**values)
+
+    def check(self, names: Iterable[str]) -> List[str]:
+        """Ошибки загрузки для списка промптов (пустой список - все на месте)"""
+        problems = []
+        for name in names:
+            try:
+                self.get(name)
+            except (PromptNotFoundError, PromptError) as e:
+                problems.append(str(e))
+        return problems
+
+
+_registries: Dict[Tuple[str, ...], PromptRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_prompt_registry(*search_dirs: Path) -> PromptRegistry:
+    """Один реестр на набор папок на весь процесс: все агенты и запуски делят кэш промптов"""
+    key = tuple(str(Path(d).resolve()) for d in search_dirs)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = PromptRegistry(search_dirs)
+    return registry
@@ -0,0 +1,168 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+REPORT_NAME = "report.md"
+
+
+def definition_hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def chain_hashes(definitions: Dict[str, Any], graph: Dict[str, List[str]]) -> Dict[str, str]:
+    """Хэш задачи = хэш ее определения и хэшей задач из context.
+    Правка задачи меняет хэш ее самой и всех задач ниже по графу, остальные сохраняются"""
+    hashes: Dict[str, str] = {}
+
+    def visit(key: str) -> str:
+        if key not in hashes:
+            hashes[key] = definition_hash({"definition": definitions[key], "context": [visit(dep) for dep in graph.get(key, [])]})
+        return hashes[key]
+
+    for key in definitions: visit(key)
+    return hashes
+
+
+def find_run_dir(output_dir: Path, run_id: str) -> Path:
+    """Папка запуска по run id (с префиксом run_ или без) среди всех flow"""
+    path = Path(run_id)
+    if (path / MANIFEST_NAME).exists(): return path
+    name = run_id if run_id.startswith("run_") else f"run_{run_id}"
+    matches = sorted(output_dir.glob(f"*/{name}"))
+    if not matches:
+        raise FileNotFoundError(f"Run '{run_id}' not found in {output_dir}")
+    return matches[0]
+
+
+def write_atomic(path: Path, text: str):
+    """Запись через временный файл: на диске всегда либо старая, либо новая версия целиком"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class RunStore:
+    """Папка запуска flow: результат каждой задачи пишется сразу после ее завершения,
+    manifest.json хранит статус и время задач, report.md собирается из готовых файлов"""
+
+    def __init__(self, flow_dir: Path, flow_name: str, task_keys: List[str], inputs: Dict[str, Any], run_label: str = "",
+                 task_hashes: Optional[Dict[str, str]] = None):
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.run_id = f"{timestamp}_{run_label}" if run_label else timestamp
+        self.run_dir = flow_dir / f"run_{self.run_id}"
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.task_keys = list(task_keys)
+        self._lock = threading.Lock()
+        self.manifest: Dict[str, Any] = {
+            "flow": flow_name,
+            "run_id": self.run_id,
+            "status": "running",
+            "started_at": time.time(),
+            "finished_at": None,
+            "inputs": inputs,
+            "inputs_hash": definition_hash(inputs),
+            "tasks": {key: self._pending_entry(key, task_hashes) for key in self.task_keys},
+        }
+        self._save_manifest()
+
+    @staticmethod
+    def _pending_entry(key: str, task_hashes: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        return {"status": "pending", "hash": (task_hashes or {}).get(key), "file": None,
+                "started_at": None, "finished_at": None, "duration": None}
+
+    @classmethod
+    def open(cls, run_dir: Path) -> "RunStore":
+        """Существующий запуск - для продолжения после сбоя"""
+        run = cls.__new__(cls)
+        with open(run_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            run.manifest = json.load(f)
+        run.run_dir = run_dir
+        run.run_id = run.manifest["run_id"]
+        run.task_keys = list(run.manifest["tasks"])
+        run._lock = threading.Lock()
+        return run
+
+    def prepare_resume(self, task_keys: List[str], task_hashes: Dict[str, str]) -> Dict[str, str]:
+        """Готовые задачи с неизменным хэшем берутся с диска, остальные (и удаленные из flow) сбрасываются.
+        Возвращает {ключ: результат} для повторно используемых задач"""
+        old_tasks = self.manifest["tasks"]
+        reused: Dict[str, str] = {}
+        tasks = {}
+        for key in task_keys:
+            entry = old_tasks.get(key)
+            path = self.run_dir / entry["file"] if entry and entry.get("file") else None
+            if entry and entry["status"] == "done" and entry.get("hash") == task_hashes[key] and path and path.exists():
+                reused[key] = path.read_text(encoding='utf-8')
+                tasks[key] = dict(entry, reused=True)
+            else:
+                tasks[key] = self._pending_entry(key, task_hashes)
+        with self._lock:
+            self.task_keys = list(task_keys)
+            self.manifest.update(status="running", finished_at=None, tasks=tasks)
+            self.manifest.pop("error", None)
+            self.manifest.setdefault("resumed_at", []).append(time.time())
+            self._save_manifest()
+        return reused
+
+    def _save_manifest(self):
+        write_atomic(self.run_dir / MANIFEST_NAME, json.dumps(self.manifest, ensure_ascii=False, indent=2, default=str))
+
+    def task_file(self, key: str) -> Path:
+        return self.run_dir / f"{self.task_keys.index(key) + 1:02d}_{key}.md"
+
+    def task_started(self, key: str):
+        with self._lock:
+            self.manifest["tasks"][key].update(status="running", started_at=time.time())
+            self._save_manifest()
+
+    def task_finished(self, key: str, output: Any):
+        path = self.task_file(key)
+        write_atomic(path, str(output))
+        with self._lock:
+            entry = self.manifest["tasks"][key]
+            finished_at = time.time()
+            duration = round(finished_at - entry["started_at"], 3) if entry["started_at"] else None
+            entry.update(status="done", file=path.name, finished_at=finished_at, duration=duration, reused=False)
+            self._save_manifest()
+
+    def task_failed(self, key: str, error: BaseException):
+        with self._lock:
+            entry = self.manifest["tasks"][key]
+            finished_at = time.time()
+            entry.update(status="failed", error=str(error), finished_at=finished_at,
+                         duration=round(finished_at - entry["started_at"], 3) if entry["started_at"] else None)
+            self._save_manifest()
+
+    def finish(self, status: str = "done", error: Optional[str] = None, links: Optional[List[str]] = None) -> Path:
+        """Сборка report.md из файлов задач (построчно, без чтения всех результатов в память).
+        links - имена файлов папки запуска (например, метрик), на которые ссылается отчет"""
+        with self._lock:
+            self.manifest.update(status=status, finished_at=time.time())
+            if error: self.manifest["error"] = error
+            self._save_manifest()
+            tasks = self.manifest["tasks"]
+
+        report_path = self.run_dir / REPORT_NAME
+        tmp_path = report_path.with_name(f"{REPORT_NAME}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(f"# {self.manifest['flow']} — {self.run_id}\n\n")
+            if status != "done":
+                out.write(f"> ⚠️ Run {status}: {error or 'not all tasks finished'}. Completed tasks only.\n\n")
+            if links:
+                out.write(" · ".join(f"[{name}]({name})" for name in links) + "\n\n")
+            for key in self.task_keys:
+                if tasks[key]["status"] != "done": continue
+                out.write(f"## {key}\n\n")
+                with open(self.run_dir / tasks[key]["file"], 'r', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, out)
+                out.write("\n\n")
+        os.replace(tmp_path, report_path)
+        return report_path
@@ -0,0 +1,162 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Граф задач: ключ задачи -> ключи задач из ее context (от кого она зависит)
+Graph = Dict[str, List[str]]
+
+
+class CycleError(ValueError):
+    """В context задач есть цикл - такой flow выполнить нельзя"""
+
+
+def find_cycle(graph: Graph) -> Optional[List[str]]:
+    """Первый найденный цикл в виде [a, b, ..., a] или None"""
+    state: Dict[str, int] = {}  # 1 - в обходе, 2 - обработан
+    path: List[str] = []
+
+    def visit(node: str) -> Optional[List[str]]:
+        state[node] = 1
+        path.append(node)
+        for dep in graph.get(node, []):
+            if state.get(dep) == 1:
+                return path[path.index(dep):] + [dep]
+            if dep not in state:
+                cycle = visit(dep)
+                if cycle: return cycle
+        path.pop()
+        state[node] = 2
+        return None
+
+    for node in graph:
+        if node not in state:
+            cycle = visit(node)
+            if cycle: return cycle
+    return None
+
+
+def topological_order(graph: Graph) -> List[str]:
+    """Порядок выполнения (Kahn): зависимости раньше зависимых, при равенстве - порядок из YAML"""
+    cycle = find_cycle(graph)
+    if cycle:
+        raise CycleError(f"Cycle in task context: {' -> '.join(cycle)}")
+    remaining = {node: len(deps) for node, deps in graph.items()}
+    dependents = _dependents(graph)
+    ready = [node for node, count in remaining.items() if count == 0]
+    order = []
+    while ready:
+        node = ready.pop(0)
+        order.append(node)
+        for child in dependents[node]:
+            remaining[child] -= 1
+            if remaining[child] == 0: ready.append(child)
+    return order
+
+
+def _dependents(graph: Graph) -> Dict[str, List[str]]:
+    dependents: Dict[str, List[str]] = {node: [] for node in graph}
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(node)
+    return dependents
+
+
+def critical_path(graph: Graph, durations: Dict[str, float]) -> Tuple[List[str], float]:
+    """Самая длинная по времени цепочка зависимостей - нижняя граница времени всего flow"""
+    best: Dict[str, Tuple[float, Optional[str]]] = {}
+    for node in topological_order(graph):
+        prev = max(graph[node], key=lambda dep: best[dep][0], default=None)
+        best[node] = (durations.get(node, 0.0) + (best[prev][0] if prev else 0.0), prev)
+    if not best: return [], 0.0
+    node: Optional[str] = max(best, key=lambda n: best[n][0])
+    total = best[node][0]
+    path = []
+    while node:
+        path.append(node)
+        node = best[node][1]
+    return path[::-1], total
+
+
+class ScheduleResult:
+    """Результаты задач и замеры времени выполнения"""
+
+    def __init__(self, outputs: Dict[str, Any], timings: Dict[str, Tuple[float, float]], elapsed: float):
+        self.outputs = outputs
+        self.timings = timings    # ключ -> (начало, конец) от старта flow, секунды
+        self.elapsed = elapsed
+
+    def durations(self) -> Dict[str, float]:
+        return {key: end - start for key, (start, end) in self.timings.items()}
+
+
+def run_dag(
+    graph: Graph,
+    run_task: Callable[[str, List[Any]], Any],
+    max_workers: int = 4,
+    groups: Optional[Dict[str, Any]] = None,
+) -> ScheduleResult:
+    """Выполняет задачи по готовности: все задачи с выполненными зависимостями запускаются сразу,
+    но не больше max_workers одновременно. run_task(ключ, результаты зависимостей) -> результат.
+    Задачи одной группы (groups: ключ -> группа, например агент) не выполняются одновременно"""
+    max_workers = max(1, max_workers)
+    order = topological_order(graph)
+    position = {node: i for i, node in enumerate(order)}
+    dependents = _dependents(graph)
+    remaining = {node: len(deps) for node, deps in graph.items()}
+    groups = groups or {}
+
+    outputs: Dict[str, Any] = {}
+    timings: Dict[str, Tuple[float, float]] = {}
+    ready = [node for node in order if remaining[node] == 0]
+    busy_groups = set()
+    running = {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def execute(node: str) -> Any:
+        begin = time.perf_counter() - started
+        try:
+            return run_task(node, [outputs[dep] for dep in graph[node]])
+        finally:
+            with lock:
+                timings[node] = (begin, time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while ready or running:
+            for node in sorted(ready, key=position.get):
+                if len(running) >= max_workers: break
+                group = groups.get(node)
+                if group is not None and group in busy_groups: continue
+                ready.remove(node)
+                if group is not None: busy_groups.add(group)
+                running[pool.submit(execute, node)] = node
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                busy_groups.discard(groups.get(node))
+                error = future.exception()
+                if error:
+                    # Новые задачи не запускаем, ждем уже начатые и пробрасываем ошибку
+                    wait(running)
+                    raise error
+                outputs[node] = future.result()
+                for child in dependents[node]:
+                    remaining[child] -= 1
+                    if remaining[child] == 0: ready.append(child)
+
+    return ScheduleResult(outputs, timings, time.perf_counter() - started)
+
+
+def format_schedule_report(graph: Graph, result: ScheduleResult) -> List[str]:
+    """Время каждой задачи и критический путь для вывода в консоль"""
+    durations = result.durations()
+    path, path_time = critical_path(graph, durations)
+    lines = ["⏱️ Task wall time:"]
+    for node, (start, end) in sorted(result.timings.items(), key=lambda item: item[1][0]):
+        marker = " *" if node in path else ""
+        lines.append(f"    {node}: {end - start:.1f}s (start +{start:.1f}s){marker}")
+    lines.append(f"🧭 Critical path: {' -> '.join(path)} ({path_time:.1f}s)")
+    lines.append(f"    Flow wall time: {result.elapsed:.1f}s, sum of task times: {sum(durations.values()):.1f}s")
+    return lines
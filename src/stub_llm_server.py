@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Локальный OpenAI-совместимый сервер (/v1/chat/completions) для проверок без сети и ключей:
+# медленный, падающий или нестабильный "провайдер" задается параметрами
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class StubBehavior:
+    """Поведение провайдера. Меняется на лету: сервер читает его при каждом запросе"""
+
+    def __init__(self, delay: float = 0.0, fail_rate: float = 0.0, fail_status: int = 429,
+                 reply: str = "stub reply", tokens_per_second: float = 0.0):
+        self.delay = delay                          # Задержка до первого байта ответа, секунды
+        self.fail_rate = fail_rate                  # Доля запросов, отвечающих fail_status
+        self.fail_status = fail_status
+        self.reply = reply
+        self.tokens_per_second = tokens_per_second  # Для stream: пауза между чанками (0 - без пауз)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._json(400, {"error": {"message": "invalid JSON"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+
+        behavior = self.server.behavior
+        behavior.count()
+        if behavior.delay: time.sleep(behavior.delay)
+        if behavior.fail_rate and random.random() < behavior.fail_rate:
+            return self._json(behavior.fail_status, {"error": {
+                "message": f"stub failure {behavior.fail_status}", "type": "stub_error", "code": behavior.fail_status}})
+
+        model = body.get("model", "stub-model")
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        words = behavior.reply.split(" ")
+        if body.get("stream"):
+            return self._stream(model, words)
+        self._json(200, {
+            "id": f"chatcmpl-stub-{behavior.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": behavior.reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+    def _stream(self, model: str, words: list):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pause = 1 / self.server.behavior.tokens_per_second if self.server.behavior.tokens_per_second else 0
+        for i, word in enumerate(words):
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            if pause: time.sleep(pause)
+        done = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _json(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, behavior: Optional[StubBehavior] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), StubHandler)
+        self.behavior = behavior or StubBehavior()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle_error(self, request: Any, client_address: Any):
+        # Клиент закрыл соединение по таймауту - для медленного провайдера это ожидаемо
+        pass
+
+    def start(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before the response starts")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--reply", default="stub reply")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming speed (0 - no pauses)")
+    args = parser.parse_args()
+    server = StubServer(StubBehavior(args.delay, args.fail_rate, args.fail_status, args.reply, args.tokens_per_second),
+                        args.host, args.port)
+    print(f"Stub LLM server at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
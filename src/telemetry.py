@@ -0,0 +1,315 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from run_store import write_atomic
+
+# Цена за 1M токенов (prompt, completion) в USD по подстроке в имени модели - берется первая подходящая.
+# Оценка для сравнения запусков, а не счет провайдера
+MODEL_PRICES = [
+    ("gpt-4o-mini", (0.15, 0.60)),
+    ("gpt-4o", (2.50, 10.00)),
+    ("gpt-5", (1.25, 10.00)),
+    ("gemini-1.5-flash", (0.075, 0.30)),
+    ("gemini", (0.30, 2.50)),
+    ("deepseek", (0.27, 1.10)),
+    ("llama-3.3-70b", (0.59, 0.79)),
+    ("qwen", (0.40, 1.20)),
+]
+CHARS_PER_TOKEN = 4         # Грубая оценка токенов, если CrewAI не отдает usage агента
+METRICS_JSON = "metrics.json"
+METRICS_PROM = "metrics.prom"
+METRICS_FILES = [METRICS_JSON, METRICS_PROM]
+
+# Текущая задача потока: LLM-клиенты общие для всех запусков, метрики пишутся в тот запуск,
+# чья задача выполняется в этом потоке
+_current = threading.local()
+
+
+def estimate_tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Стоимость в USD или None, если модели нет в MODEL_PRICES"""
+    price = next((p for marker, p in MODEL_PRICES if marker in (model or "")), None)
+    if price is None: return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def _agent_usage(agent: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) токенов, посчитанных CrewAI для агента, если версия это поддерживает"""
+    token_process = getattr(agent, "_token_process", None)
+    if token_process is None or not hasattr(token_process, "get_summary"): return None
+    usage = token_process.get_summary()
+    return int(getattr(usage, "prompt_tokens", 0) or 0), int(getattr(usage, "completion_tokens", 0) or 0)
+
+
+class RunMetrics:
+    """Метрики одного запуска flow: время, вызовы LLM, токены, повторы и стоимость
+    по задачам, агентам и моделям. Один объект на все потоки запуска"""
+
+    def __init__(self, flow_name: str, run_id: str):
+        self.flow_name = flow_name
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.contexts: Dict[str, Dict[str, int]] = {}   # ключ задачи -> токены context до и после сжатия
+        self.cache = {"hits": 0, "misses": 0, "stores": 0}  # обращения к кэшу ответов LLM за этот запуск
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def task(self, key: str, agent: Any) -> Iterator[Dict[str, Any]]:
+        """Все вызовы LLM и шаги агента в этом потоке внутри блока относятся к задаче key"""
+        llm = getattr(agent, "llm", None)
+        entry = {
+            "agent": getattr(agent, "role", None) or "",
+            "model": getattr(llm, "model", None) or "",
+            "status": "running",
+            "wall_time": 0.0,
+            "llm_calls": 0,
+            "llm_time": 0.0,
+            "retries": 0,
+            "steps": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tokens_estimated": True,
+            "output_chars": 0,
+            "models": {},       # модель, которая реально отвечала (с учетом запасных) -> ее вызовы и токены
+        }
+        with self._lock:
+            self.tasks[key] = entry
+        usage_before = _agent_usage(agent)
+        _current.metrics, _current.key = self, key
+        started = time.perf_counter()
+        try:
+            yield entry
+            entry["status"] = "done"
+        except BaseException:
+            entry["status"] = "failed"
+            raise
+        finally:
+            _current.metrics = _current.key = None
+            usage_after = _agent_usage(agent)
+            with self._lock:
+                entry["wall_time"] = round(time.perf_counter() - started, 3)
+                # Один агент не выполняет две задачи одновременно, так что разница usage - это токены задачи
+                if usage_before is not None and usage_after is not None and usage_after != usage_before:
+                    entry["prompt_tokens"] = usage_after[0] - usage_before[0]
+                    entry["completion_tokens"] = usage_after[1] - usage_before[1]
+                    entry["tokens_estimated"] = False
+                    _rescale_models(entry)
+
+    def reused(self, key: str):
+        """Задача взята из чекпоинта - LLM не вызывалась"""
+        with self._lock:
+            self.tasks[key] = {"status": "reused", "agent": "", "model": "", "wall_time": 0.0, "llm_calls": 0,
+                               "llm_time": 0.0, "retries": 0, "steps": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                               "tokens_estimated": False, "output_chars": 0, "models": {}}
+
+    def record_call(self, key: str, model: str, duration: float, prompt_tokens: int, completion_tokens: int,
+                    failed: bool):
+        """Вызов LLM задачи key моделью model - той, что реально отвечала (или упала), а не основной модели агента"""
+        with self._lock:
+            entry = self.tasks[key]
+            per_model = entry["models"].setdefault(model or "", {"llm_calls": 0, "llm_time": 0.0, "retries": 0,
+                                                                 "prompt_tokens": 0, "completion_tokens": 0})
+            # Упавший вызов CrewAI повторяет, маршрутизатор переходит к запасной модели (или задача падает) -
+            # считаем его повтором
+            for stats in (entry, per_model):
+                stats["llm_calls"] += 1
+                stats["llm_time"] = round(stats["llm_time"] + duration, 3)
+                if failed: stats["retries"] += 1
+            per_model["prompt_tokens"] += prompt_tokens
+            per_model["completion_tokens"] += completion_tokens
+            if entry["tokens_estimated"]:
+                entry["prompt_tokens"] += prompt_tokens
+                entry["completion_tokens"] += completion_tokens
+
+    def record_context(self, key: str, tokens_in: int, tokens_out: int):
+        with self._lock:
+            self.contexts[key] = {"context_tokens_in": tokens_in, "context_tokens_out": tokens_out,
+                                  "context_tokens_saved": tokens_in - tokens_out}
+
+    def record_cache(self, event: str):
+        with self._lock:
+            self.cache[event] += 1
+
+    def record_step(self, key: str):
+        with self._lock:
+            self.tasks[key]["steps"] += 1
+
+    def record_output(self, key: str, output: Any):
+        with self._lock:
+            self.tasks[key]["output_chars"] = len(str(getattr(output, "raw", output)))
+
+    def summary(self) -> Dict[str, Any]:
+        """Метрики по задачам и сводки по агентам, моделям и запуску целиком"""
+        with self._lock:
+            tasks = {key: dict(entry, **self.contexts.get(key, {})) for key, entry in self.tasks.items()}
+        for entry in tasks.values():
+            entry["models"] = {model: dict(stats) for model, stats in entry["models"].items()}
+            for model, stats in entry["models"].items():
+                stats["cost_usd"] = estimate_cost(model, stats["prompt_tokens"], stats["completion_tokens"])
+            if entry["models"]:
+                # Стоимость по моделям, которые реально отвечали: запасная модель считается по своей цене
+                costs = [stats["cost_usd"] for stats in entry["models"].values() if stats["cost_usd"] is not None]
+                entry["cost_usd"] = sum(costs) if costs else None
+            else:
+                entry["cost_usd"] = estimate_cost(entry["model"], entry["prompt_tokens"], entry["completion_tokens"])
+
+        def rollup(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+            costs = [e["cost_usd"] for e in entries if e["cost_usd"] is not None]
+            return {
+                "tasks": len(entries),
+                "wall_time": round(sum(e.get("wall_time", 0.0) for e in entries), 3),
+                "llm_calls": sum(e["llm_calls"] for e in entries),
+                "llm_time": round(sum(e["llm_time"] for e in entries), 3),
+                "retries": sum(e["retries"] for e in entries),
+                "prompt_tokens": sum(e["prompt_tokens"] for e in entries),
+                "completion_tokens": sum(e["completion_tokens"] for e in entries),
+                "cost_usd": round(sum(costs), 6) if costs else None,
+                "context_tokens_saved": sum(e.get("context_tokens_saved", 0) for e in entries),
+            }
+
+        executed = [e for e in tasks.values() if e["status"] != "reused"]
+        by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        by_model: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in executed:
+            by_agent.setdefault(entry["agent"], []).append(entry)
+            for model, stats in entry["models"].items():
+                by_model.setdefault(model, []).append(stats)
+        return {
+            "flow": self.flow_name,
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "elapsed": round(time.time() - self.started_at, 3),
+            "total": rollup(executed),
+            "tasks": tasks,
+            "agents": {name: rollup(entries) for name, entries in by_agent.items()},
+            # Время задачи и сжатие context к модели не относятся - у модели только ее вызовы
+            "llm_cache": dict(self.cache),
+            "models": {name: {k: v for k, v in rollup(entries).items() if k not in ("wall_time", "context_tokens_saved")}
+                       for name, entries in by_model.items()},
+        }
+
+    def prometheus_text(self, summary: Optional[Dict[str, Any]] = None) -> str:
+        """Text exposition format: по одной серии на задачу, агент и модель в метках"""
+        summary = summary or self.summary()
+        series = [
+            ("agency_task_wall_time_seconds", "gauge", "Task wall time", "wall_time"),
+            ("agency_task_llm_calls_total", "counter", "LLM calls made by the task", "llm_calls"),
+            ("agency_task_llm_retries_total", "counter", "Failed LLM calls (retried or fatal)", "retries"),
+            ("agency_task_agent_steps_total", "counter", "Agent steps reported by step_callback", "steps"),
+            ("agency_task_prompt_tokens_total", "counter", "Prompt tokens", "prompt_tokens"),
+            ("agency_task_completion_tokens_total", "counter", "Completion tokens", "completion_tokens"),
+            ("agency_task_cost_usd", "gauge", "Estimated cost in USD", "cost_usd"),
+            ("agency_task_context_tokens_saved", "gauge", "Context tokens removed by compression", "context_tokens_saved"),
+        ]
+        lines = []
+        for name, kind, help_text, field in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for key, entry in summary["tasks"].items():
+                if entry["status"] == "reused" or entry.get(field) is None: continue
+                labels = _labels(flow=self.flow_name, run_id=self.run_id, task=key, agent=entry["agent"],
+                                 model=entry["model"], status=entry["status"])
+                lines.append(f"{name}{{{labels}}} {entry[field]}")
+        model_series = [
+            ("agency_model_llm_calls_total", "counter", "LLM calls served by the model (fallbacks included)", "llm_calls"),
+            ("agency_model_llm_failures_total", "counter", "Failed LLM calls of the model", "retries"),
+            ("agency_model_prompt_tokens_total", "counter", "Prompt tokens sent to the model", "prompt_tokens"),
+            ("agency_model_completion_tokens_total", "counter", "Completion tokens of the model", "completion_tokens"),
+            ("agency_model_cost_usd", "gauge", "Estimated cost of the model in USD", "cost_usd"),
+        ]
+        for name, kind, help_text, field in model_series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for key, entry in summary["tasks"].items():
+                for model, stats in entry["models"].items():
+                    if stats.get(field) is None: continue
+                    labels = _labels(flow=self.flow_name, run_id=self.run_id, task=key, agent=entry["agent"], model=model)
+                    lines.append(f"{name}{{{labels}}} {stats[field]}")
+        lines += ["# HELP agency_run_elapsed_seconds Run wall time", "# TYPE agency_run_elapsed_seconds gauge",
+                  f"agency_run_elapsed_seconds{{{_labels(flow=self.flow_name, run_id=self.run_id)}}} {summary['elapsed']}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, run_dir: Path) -> Path:
+        """metrics.json и metrics.prom в папке запуска, рядом с report.md"""
+        summary = self.summary()
+        json_path = run_dir / METRICS_JSON
+        write_atomic(json_path, json.dumps(summary, ensure_ascii=False, indent=2))
+        write_atomic(run_dir / METRICS_PROM, self.prometheus_text(summary))
+        return json_path
+
+    def format_summary(self) -> List[str]:
+        summary = self.summary()
+        total, cache = summary["total"], summary["llm_cache"]
+        cost = f"${total['cost_usd']:.4f}" if total["cost_usd"] is not None else "n/a"
+        lines = [f"📊 LLM: {total['llm_calls']} calls, {total['retries']} retries, "
+                 f"{total['prompt_tokens']}+{total['completion_tokens']} tokens, est. cost {cost}, "
+                 f"{total['context_tokens_saved']} context tokens saved by compression"]
+        lookups = cache["hits"] + cache["misses"]
+        if lookups:
+            lines.append(f"💾 LLM cache: {cache['hits']} hits, {cache['misses']} misses "
+                         f"({cache['hits'] / lookups * 100:.0f}% hit rate), {cache['stores']} stored")
+        return lines
+
+
+def _rescale_models(entry: Dict[str, Any]):
+    """Точные токены задачи от CrewAI делятся между моделями пропорционально оценкам по их вызовам"""
+    for field in ("prompt_tokens", "completion_tokens"):
+        estimated = sum(stats[field] for stats in entry["models"].values())
+        if not estimated: continue
+        for stats in entry["models"].values():
+            stats[field] = round(entry[field] * stats[field] / estimated)
+
+
+def _labels(**labels: str) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in labels.values())
+    return ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped))
+
+
+def instrument_llm(llm: Any) -> Any:
+    """Подмена llm.call на версию, которая пишет время, токены и ошибки в метрики текущей задачи потока.
+    Инструментируется каждый провайдер отдельно (до route_llm), поэтому вызов записывается на модель,
+    которая его реально обслужила, а упавшие попытки - на свои модели"""
+    original_call = llm.call
+    model = getattr(llm, "model", None) or ""
+
+    def instrumented_call(messages: Any, tools: Any = None, *args: Any, **kwargs: Any) -> Any:
+        metrics, key = getattr(_current, "metrics", None), getattr(_current, "key", None)
+        if metrics is None:
+            return original_call(messages, tools, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = original_call(messages, tools, *args, **kwargs)
+        except Exception:
+            metrics.record_call(key, model, time.perf_counter() - started, estimate_tokens(messages), 0, failed=True)
+            raise
+        metrics.record_call(key, model, time.perf_counter() - started, estimate_tokens(messages),
+                            estimate_tokens(response), failed=False)
+        return response
+
+    object.__setattr__(llm, "call", instrumented_call)
+    return llm
+
+
+def step_callback(step: Any):
+    """step_callback агента: шаг (мысль, вызов инструмента, ответ) в метрики текущей задачи"""
+    metrics, key = getattr(_current, "metrics", None), getattr(_current, "key", None)
+    if metrics is not None: metrics.record_step(key)
+
+
+def cache_event(event: str):
+    """Обращение к кэшу ответов LLM (hits, misses, stores) в метрики запуска текущей задачи"""
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None: metrics.record_cache(event)
+
+
+def task_callback(output: Any):
+    """callback задачи: размер итогового ответа"""
+    metrics, key = getattr(_current, "metrics", None), getattr(_current, "key", None)
+    if metrics is not None: metrics.record_output(key, output)
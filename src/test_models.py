@@ -3,6 +3,12 @@ import sys
 import os
 import asyncio
 import signal
+import argparse
+import threading
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 # --- WINDOWS COMPATIBILITY PATCHES (NUCLEAR OPTION) ---
@@ -10,13 +16,13 @@ from dotenv import load_dotenv
 if sys.platform.startswith('win'):
     # 1. Asyncio Fix
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    
+
     # 2. Signal Fix (Глушим всё)
     unix_signals = [
-        'SIGABRT', 'SIGALRM', 'SIGBUS', 'SIGCHLD', 'SIGCONT', 'SIGFPE', 'SIGHUP', 
-        'SIGILL', 'SIGINT', 'SIGIO', 'SIGIOT', 'SIGKILL', 'SIGPIPE', 'SIGPOLL', 
-        'SIGPROF', 'SIGPWR', 'SIGQUIT', 'SIGSEGV', 'SIGSTOP', 'SIGSYS', 'SIGTERM', 
-        'SIGTRAP', 'SIGTSTP', 'SIGTTIN', 'SIGTTOU', 'SIGURG', 'SIGUSR1', 'SIGUSR2', 
+        'SIGABRT', 'SIGALRM', 'SIGBUS', 'SIGCHLD', 'SIGCONT', 'SIGFPE', 'SIGHUP',
+        'SIGILL', 'SIGINT', 'SIGIO', 'SIGIOT', 'SIGKILL', 'SIGPIPE', 'SIGPOLL',
+        'SIGPROF', 'SIGPWR', 'SIGQUIT', 'SIGSEGV', 'SIGSTOP', 'SIGSYS', 'SIGTERM',
+        'SIGTRAP', 'SIGTSTP', 'SIGTTIN', 'SIGTTOU', 'SIGURG', 'SIGUSR1', 'SIGUSR2',
         'SIGVTALRM', 'SIGWINCH', 'SIGXCPU', 'SIGXFSZ'
     ]
     for name in unix_signals:
@@ -24,42 +30,187 @@ if sys.platform.startswith('win'):
             try: setattr(signal, name, getattr(signal, 'SIGTERM', 1))
             except AttributeError: setattr(signal, name, 1)
 
-# Импорт CrewAI строго ПОСЛЕ патча
-from crewai import LLM
-
 load_dotenv()
 
-def test_model(provider_name, model_name, api_key_env):
-    print(f"\n🧪 Тестируем: {provider_name} ({model_name})...")
-    
-    key = os.getenv(api_key_env)
-    if not key:
-        print(f"❌ ОШИБКА: Нет ключа {api_key_env} в .env")
-        return
+# Провайдеры: имя, модель (litellm), переменная с ключом, base_url
+PROVIDERS = [
+    {"name": "Google", "model": "gemini/gemini-2.5-flash", "api_key_env": "GEMINI_API_KEY"},             # Researcher
+    {"name": "Groq", "model": "groq/llama-3.3-70b-versatile", "api_key_env": "GROQ_API_KEY"},            # Skeptic/Coder
+    {"name": "OpenAI", "model": "gpt-5.1", "api_key_env": "OPENAI_API_KEY"},                              # Boss
+    {"name": "DeepSeek", "model": "deepseek/deepseek-coder", "api_key_env": "DEEPSEEK_API_KEY"},         # Coder
+]
+PROMPT = "Скажи 'Работает' и назови свою модель."
+TIMEOUT = 30.0
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль по ближайшему рангу (None для пустого списка)"""
+    if not values: return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
 
+def call_stream(provider: Dict[str, Any], timeout: float, prompt: str = PROMPT) -> Dict[str, Any]:
+    """Один потоковый вызов: время до первого токена, полное время, число токенов ответа"""
+    import litellm
+
+    key = os.getenv(provider["api_key_env"]) if provider.get("api_key_env") else None
+    if provider.get("api_key_env") and not key:
+        return {"ok": False, "error": f"Нет ключа {provider['api_key_env']} в .env"}
+    started = time.perf_counter()
+    ttft = None
+    chunks = 0
+    usage_tokens = None
+    text = []
     try:
-        # Инициализация LLM
-        llm = LLM(model=model_name, api_key=key)
-        # Простой вызов
-        response = llm.call("Скажи 'Работает' и назови свою модель.")
-        print(f"✅ УСПЕХ: {response}")
+        response = litellm.completion(
+            model=provider["model"],
+            messages=[{"role": "user", "content": prompt}],
+            api_key=key,
+            api_base=provider.get("base_url"),
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in response:
+            usage = getattr(chunk, "usage", None)
+            if usage and getattr(usage, "completion_tokens", None):
+                usage_tokens = usage.completion_tokens
+            if not chunk.choices: continue
+            content = chunk.choices[0].delta.content
+            if content:
+                if ttft is None: ttft = time.perf_counter() - started
+                chunks += 1
+                text.append(content)
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"stream exceeded {timeout}s")
     except Exception as e:
-        print(f"❌ ОШИБКА подключения к {provider_name}: {e}")
+        return {"ok": False, "error": f"{type(e).__name__}: {str(e)[:200]}", "latency": time.perf_counter() - started}
+    latency = time.perf_counter() - started
+    tokens = usage_tokens or chunks
+    generation = latency - (ttft or 0)
+    return {
+        "ok": True,
+        "ttft": ttft,
+        "latency": latency,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / generation if generation > 0 else None,
+        "text": "".join(text),
+    }
 
-if __name__ == "__main__":
-    print("=== ПРОВЕРКА МОДЕЛЕЙ (MULTI-LLM CHECK) ===")
-    
-    # 1. Google Gemini (Researcher)
-    test_model("Google", "gemini/gemini-2.5-flash", "GEMINI_API_KEY")
-    
-    # 2. Groq (Skeptic/Coder)
-    # Используем llama-3.3-70b-versatile, она стабильнее
-    test_model("Groq", "groq/llama-3.3-70b-versatile", "GROQ_API_KEY")
-    
-    # 3. OpenAI (Boss)
-    test_model("OpenAI", "gpt-5.1", "OPENAI_API_KEY")
-
-
-    # 4. DeepSeek (coder)
-    test_model("DeepSeek", "deepseek/deepseek-coder", "DEEPSEEK_API_KEY")
+def probe(providers: List[Dict[str, Any]], timeout: float) -> Dict[str, Dict[str, Any]]:
+    """Все провайдеры параллельно, по одному вызову; зависший провайдер не держит остальных дольше timeout.
+    Потоки-демоны: зависший вызов не задерживает и выход из программы (поток пула ждал бы таймаута litellm)"""
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def run(provider: Dict[str, Any]):
+        results[provider["name"]] = call_stream(provider, timeout)
+
+    threads = [threading.Thread(target=run, args=(provider,), name=f"probe-{provider['name']}", daemon=True)
+               for provider in providers]
+    for thread in threads: thread.start()
+    deadline = time.monotonic() + timeout + 5
+    for thread in threads: thread.join(max(0.0, deadline - time.monotonic()))
+    return {provider["name"]: results.get(provider["name"], {"ok": False, "error": f"no answer in {timeout}s"})
+            for provider in providers}
+
+def benchmark(provider: Dict[str, Any], calls: int, concurrency: int, timeout: float) -> Dict[str, Any]:
+    """N вызовов одного провайдера (concurrency одновременно): TTFT, задержка p50/p95/p99, токены/сек, доля ошибок"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        samples = list(pool.map(lambda _: call_stream(provider, timeout), range(calls)))
+    elapsed = time.perf_counter() - started
+    ok = [s for s in samples if s["ok"]]
+    errors = [s["error"] for s in samples if not s["ok"]]
+
+    def stats_ms(values: List[float]) -> Dict[str, Optional[float]]:
+        return {f"p{p}": round(percentile(values, p) * 1000, 1) if values else None for p in (50, 95, 99)}
 
+    rates = [s["tokens_per_sec"] for s in ok if s["tokens_per_sec"]]
+    return {
+        "model": provider["model"],
+        "calls": calls,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / calls, 3) if calls else 0.0,
+        "ttft_ms": stats_ms([s["ttft"] for s in ok if s["ttft"] is not None]),
+        "latency_ms": stats_ms([s["latency"] for s in ok]),
+        "tokens_per_sec": round(sum(rates) / len(rates), 1) if rates else None,
+        "completion_tokens": sum(s["tokens"] for s in ok),
+        "wall_time_s": round(elapsed, 3),
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+def start_stubs(providers: List[Dict[str, Any]], delay: float, fail_rate: float, tokens_per_second: float) -> List[Any]:
+    """Локальные OpenAI-совместимые заглушки вместо провайдеров - для CI без сети и ключей"""
+    from stub_llm_server import StubBehavior, StubServer
+
+    servers = []
+    reply = "Работает. Это локальная заглушка OpenAI-совместимого API для проверки без сети."
+    for provider in providers:
+        server = StubServer(StubBehavior(delay, fail_rate, 429, reply, tokens_per_second)).start()
+        provider.update(model=f"openai/stub-{provider['name'].lower()}", base_url=server.base_url, api_key_env="STUB_API_KEY")
+        servers.append(server)
+    os.environ.setdefault("STUB_API_KEY", "stub")
+    return servers
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Probe LLM providers in parallel or benchmark them")
+    parser.add_argument("--bench", type=int, metavar="N", help="Benchmark mode: N calls per provider")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel calls per provider in benchmark mode")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="Seconds per call")
+    parser.add_argument("--providers", help="Comma-separated provider names (default: all)")
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON ('-' for stdout)")
+    parser.add_argument("--stub", action="store_true", help="Run against local stub servers (offline, for CI)")
+    parser.add_argument("--stub-delay", type=float, default=0.05, help="Stub time to first byte, seconds")
+    parser.add_argument("--stub-fail-rate", type=float, default=0.0, help="Share of stub calls answering 429")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=200.0, help="Stub streaming speed")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    providers = [dict(p) for p in PROVIDERS]
+    if args.providers:
+        wanted = {name.strip().lower() for name in args.providers.split(",")}
+        providers = [p for p in providers if p["name"].lower() in wanted]
+    if not providers:
+        print("❌ Нет провайдеров для проверки")
+        sys.exit(2)
+    servers = start_stubs(providers, args.stub_delay, args.stub_fail_rate, args.stub_tokens_per_second) if args.stub else []
+
+    try:
+        if args.bench:
+            print(f"=== БЕНЧМАРК: {args.bench} вызовов на провайдера, {args.concurrency} одновременно ===")
+            with ThreadPoolExecutor(max_workers=len(providers)) as pool:
+                futures = {p["name"]: pool.submit(benchmark, p, args.bench, args.concurrency, args.timeout) for p in providers}
+                results = {name: future.result() for name, future in futures.items()}
+            for name, r in results.items():
+                print(f"{'✅' if r['errors'] < r['calls'] else '❌'} {name:<10} TTFT p50 {r['ttft_ms']['p50']} ms, "
+                      f"latency p50/p95/p99 {r['latency_ms']['p50']}/{r['latency_ms']['p95']}/{r['latency_ms']['p99']} ms, "
+                      f"{r['tokens_per_sec']} tok/s, errors {r['error_rate'] * 100:.0f}%")
+            failed = any(r["errors"] == r["calls"] for r in results.values())
+        else:
+            print("=== ПРОВЕРКА МОДЕЛЕЙ (MULTI-LLM CHECK) ===")
+            results = probe(providers, args.timeout)
+            for provider in providers:
+                r = results[provider["name"]]
+                if r["ok"]:
+                    print(f"✅ {provider['name']} ({provider['model']}): {r['latency']:.2f}s, TTFT {r['ttft'] or 0:.2f}s — {r['text'][:80]}")
+                else:
+                    print(f"❌ {provider['name']} ({provider['model']}): {r['error']}")
+            failed = not all(r["ok"] for r in results.values())
+    finally:
+        for server in servers: server.stop()
+
+    if args.json:
+        data = json.dumps({"mode": "bench" if args.bench else "probe", "stub": args.stub, "results": results},
+                          ensure_ascii=False, indent=2, default=str)
+        if args.json == "-":
+            print(data)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                f.write(data)
+            print(f"💾 Results saved to {args.json}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()